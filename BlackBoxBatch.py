@@ -0,0 +1,109 @@
+# Description: Batch version of BlackBoxGame.shoot_ray for offline scoring of recorded games. Instead of moving one
+# ray at a time through a BlackBoxGame object, every ray in the batch is advanced in lockstep with NumPy operations over
+# an occupancy array of all the atom layouts. The results match BlackBoxGame.shoot_ray for every entry point.
+
+import numpy as np
+
+# Outcome kinds stored in the first column of the array returned by shoot_rays.
+INVALID = -1  # the entry point is not on the edge of the board (shoot_ray returns False).
+HIT = 0  # the ray hit an atom; row/col hold the atom that was hit (shoot_ray returns None).
+REFLECTION = 1  # the ray came back out where it went in; row/col hold the entry point.
+EXIT = 2  # the ray came out somewhere else; row/col hold the exit point.
+
+
+def occupancy_from_atoms(layouts, size=10):
+    """ This function turns a list of atom lists (one per game, in the same format BlackBoxGame accepts) into a boolean
+    occupancy array of shape (games, rows, cols) that can be passed to shoot_rays. The size works the same way as it
+    does for BlackBoxGame and every atom must be on the board. """
+    if isinstance(size, int):
+        size = (size, size)
+    occupancy = np.zeros((len(layouts), size[0], size[1]), dtype=bool)
+    for game, atom_list in enumerate(layouts):
+        if len(atom_list) > 0:
+            atoms = np.asarray(atom_list, dtype=np.intp)
+            occupancy[game, atoms[:, 0], atoms[:, 1]] = True
+    return occupancy
+
+
+def shoot_rays(occupancy, entry_rows, entry_cols, games=None):
+    """ This function shoots one ray per entry point and returns an int array of shape (rays, 3) where each row is
+    (kind, row, col) using the INVALID, HIT, REFLECTION and EXIT kinds above. The occupancy is a boolean array of
+    shape (games, rows, cols), and games gives the index of the layout each ray is shot into. If games is left out,
+    ray i is shot into layout i. Unlike shoot_ray, nothing is scored here since there is no game state to update. """
+    occupancy = np.asarray(occupancy, dtype=bool)
+    if occupancy.ndim == 2:
+        occupancy = occupancy[np.newaxis]
+    num_games, rows, cols = occupancy.shape
+    entry_rows = np.asarray(entry_rows, dtype=np.intp).ravel()
+    entry_cols = np.asarray(entry_cols, dtype=np.intp).ravel()
+    if games is None:
+        games = np.arange(len(entry_rows), dtype=np.intp)
+    else:
+        games = np.broadcast_to(np.asarray(games, dtype=np.intp), entry_rows.shape)
+
+    outcomes = np.full((len(entry_rows), 3), -1, dtype=np.intp)
+    outcomes[:, 0] = INVALID
+
+    # an entry point is valid if it is on the board and on exactly one edge (corners are not allowed).
+    on_board = (entry_rows >= 0) & (entry_rows < rows) & (entry_cols >= 0) & (entry_cols < cols)
+    valid = on_board & (_on_edge_row(entry_rows, rows) != _on_edge_col(entry_cols, cols))
+    ray = np.flatnonzero(valid)  # index into outcomes of every ray that is still moving.
+    game = games[ray]
+    row = entry_rows[ray]
+    col = entry_cols[ray]
+
+    # same starting directions as set_direction, stored as (row step, column step).
+    d_row = np.where(row == 0, 1, np.where(row == rows - 1, -1, 0))
+    d_col = np.where(d_row != 0, 0, np.where(col == 0, 1, -1))
+
+    # pad the board with an empty border so the cells around an edge position can be looked at without bounds checks.
+    padded = np.zeros((num_games, rows + 2, cols + 2), dtype=bool)
+    padded[:, 1:-1, 1:-1] = occupancy
+
+    while len(ray) > 0:
+        # the cell in front of the ray, and the two cells on either side of it. (d_col, d_row) is at a right angle
+        # to the direction of the ray, so front + side and front - side are the two diagonal cells.
+        front_row = row + d_row
+        front_col = col + d_col
+        front = padded[game, front_row + 1, front_col + 1]
+        side_a = padded[game, front_row + d_col + 1, front_col + d_row + 1]
+        side_b = padded[game, front_row - d_col + 1, front_col - d_row + 1]
+
+        hit = front
+        reverse = ~hit & side_a & side_b  # double deflection, go back the way the ray came.
+        away_from_a = ~hit & side_a & ~side_b
+        away_from_b = ~hit & side_b & ~side_a
+        move = ~(hit | side_a | side_b)
+
+        # turning away from an atom on side a means moving in the -side direction, and the other way round for b.
+        new_d_row = np.where(reverse, -d_row, np.where(away_from_a, -d_col, np.where(away_from_b, d_col, d_row)))
+        new_d_col = np.where(reverse, -d_col, np.where(away_from_a, -d_row, np.where(away_from_b, d_row, d_col)))
+        d_row, d_col = new_d_row, new_d_col
+        row = np.where(move, front_row, row)
+        col = np.where(move, front_col, col)
+
+        outcomes[ray[hit], 0] = HIT
+        outcomes[ray[hit], 1] = front_row[hit]
+        outcomes[ray[hit], 2] = front_col[hit]
+
+        # just like shoot_ray, the edge is only checked after a step, so every ray gets at least one move.
+        exited = ~hit & (_on_edge_row(row, rows) != _on_edge_col(col, cols))
+        reflected = exited & (row == entry_rows[ray]) & (col == entry_cols[ray])
+        outcomes[ray[exited], 0] = EXIT
+        outcomes[ray[reflected], 0] = REFLECTION
+        outcomes[ray[exited], 1] = row[exited]
+        outcomes[ray[exited], 2] = col[exited]
+
+        keep = ~(hit | exited)
+        ray, game, row, col, d_row, d_col = ray[keep], game[keep], row[keep], col[keep], d_row[keep], d_col[keep]
+    return outcomes
+
+
+def _on_edge_row(rows_array, rows):
+    """ Helper function that returns a boolean array telling which of the given rows are the first or last row. """
+    return (rows_array == 0) | (rows_array == rows - 1)
+
+
+def _on_edge_col(cols_array, cols):
+    """ Helper function that returns a boolean array telling which of the given columns are the first or last one. """
+    return (cols_array == 0) | (cols_array == cols - 1)
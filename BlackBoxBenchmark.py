@@ -0,0 +1,157 @@
+# Description: Benchmarks for the hot paths of BlackBoxGame: shoot_ray throughput, the cost of a single step of a ray
+# through iter_ray, guess_atom latency and the cost of creating a game. Each benchmark is run on boards from a single
+# atom up to a full board. Results are written as JSON, and can be compared against a stored baseline to catch
+# slowdowns before they are deployed.
+#
+# python BlackBoxBenchmark.py --output results.json
+# python BlackBoxBenchmark.py --baseline baseline.json --threshold 0.2
+
+import argparse
+import json
+import platform
+import random
+import sys
+import timeit
+
+import BlackBoxGame as blackbox
+
+DENSITIES = [1, 4, 8, 16, 32, 64]  # numbers of atoms to benchmark with (64 fills the inside of a 10x10 board).
+SEED = 2020
+
+
+def make_layout(num_atoms, seed=SEED):
+    """ This function returns the same layout of num_atoms atoms on a 10x10 board every time it is called. """
+    rng = random.Random(seed + num_atoms)
+    cells = [(row, col) for row in range(1, 9) for col in range(1, 9)]
+    return rng.sample(cells, num_atoms)
+
+
+def time_per_call(function, repeat=3):
+    """ This function returns the fastest time in seconds of a single call to function, out of repeat runs that are
+    each long enough to time accurately. """
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def bench_shoot_ray(atoms, precompute):
+    """ Time to shoot a ray from every entry point once, divided by the number of entry points. The game is put back
+    to its starting state before every round so that scoring runs the same way each time. """
+    entries = sorted(blackbox.edge_positions(10, 10))
+    game = blackbox.BlackBoxGame(atoms, precompute)
+    start = game.snapshot()
+
+    def shoot_all():
+        game.restore(start)
+        for row, col in entries:
+            game.shoot_ray(row, col)
+    return time_per_call(shoot_all) / len(entries)
+
+
+def bench_ray_step(atoms):
+    """ Time for a single step of a ray through iter_ray, averaged over a ray from every entry point. """
+    entries = sorted(blackbox.edge_positions(10, 10))
+    game = blackbox.BlackBoxGame(atoms)
+    steps = sum(len(list(game.iter_ray(row, col))) for row, col in entries)
+
+    def step_all():
+        for row, col in entries:
+            for _ in game.iter_ray(row, col):
+                pass
+    return time_per_call(step_all) / steps
+
+
+def bench_guess_atom(atoms):
+    """ Time for a single guess_atom call, averaged over guessing every inside cell of a game in its starting state. """
+    cells = [(row, col) for row in range(1, 9) for col in range(1, 9)]
+    game = blackbox.BlackBoxGame(atoms)
+    start = game.snapshot()
+
+    def guess_all():
+        game.restore(start)
+        for row, col in cells:
+            game.guess_atom(row, col)
+    return time_per_call(guess_all) / len(cells)
+
+
+def bench_init(atoms, cached):
+    """ Time to create a game. If cached is False, the shared layout tables are thrown away first so the cost of
+    building them is included. """
+    if cached:
+        return time_per_call(lambda: blackbox.BlackBoxGame(atoms))
+
+    def init_cold():
+        blackbox.layout_tables.cache_clear()
+        blackbox.BlackBoxGame(atoms)
+    return time_per_call(init_cold)
+
+
+def run_benchmarks(densities=DENSITIES):
+    """ This function runs every benchmark at every density and returns a dictionary that maps a benchmark name to
+    its time in seconds per operation. """
+    results = {}
+    for num_atoms in densities:
+        atoms = make_layout(num_atoms)
+        suffix = '[atoms=%d]' % num_atoms
+        results['shoot_ray' + suffix] = bench_shoot_ray(atoms, False)
+        results['shoot_ray_precomputed' + suffix] = bench_shoot_ray(atoms, True)
+        results['ray_step' + suffix] = bench_ray_step(atoms)
+        results['guess_atom' + suffix] = bench_guess_atom(atoms)
+        results['init' + suffix] = bench_init(atoms, True)
+        results['init_cold' + suffix] = bench_init(atoms, False)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """ This function compares results against a baseline and returns a list of (name, baseline, current, change)
+    tuples for every benchmark that got slower by more than threshold (0.2 means 20%). Benchmarks missing from either
+    side are skipped. """
+    regressions = []
+    for name, current in sorted(results.items()):
+        previous = baseline.get(name)
+        if previous is None or previous <= 0:
+            continue
+        change = current / previous - 1
+        if change > threshold:
+            regressions.append((name, previous, current, change))
+    return regressions
+
+
+def main():
+    """ Command line entry point that runs the benchmarks, writes them out and checks them against a baseline.
+    Exits with status 1 if anything regressed. """
+    parser = argparse.ArgumentParser(description='Benchmark the BlackBoxGame hot paths.')
+    parser.add_argument('--output', help='file to write the results to as JSON (printed if left out)')
+    parser.add_argument('--baseline', help='JSON results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown before failing (0.2 = 20%%)')
+    parser.add_argument('--densities', type=int, nargs='+', default=DENSITIES)
+    args = parser.parse_args()
+
+    report = {
+        'python': sys.version.split()[0],
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'unit': 'seconds per operation',
+        'results': run_benchmarks(args.densities),
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(text + '\n')
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)['results']
+        regressions = compare(report['results'], baseline, args.threshold)
+        for name, previous, current, change in regressions:
+            print('REGRESSION %s: %.3g s -> %.3g s (%+.0f%%)' % (name, previous, current, change * 100),
+                  file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print('no regressions against', args.baseline, file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
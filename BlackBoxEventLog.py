@@ -0,0 +1,198 @@
+# Description: Append-only binary log of every shot and guess in a set of Black Box games, and a replay engine that
+# rebuilds the games from it. Every event is a fixed-width 16 byte record, so the log can be read back with a memory
+# map and unpacked in bulk. Shots are stored together with how the ray ended, which means replaying them only has to
+# redo the scoring and never moves a ray through the board.
+
+import mmap
+import os
+import struct
+
+from BlackBoxGame import BlackBoxGame
+
+MAGIC = b'BBXLOG\x00\x01' + bytes(8)  # file header, padded to the size of a record.
+
+# record layout: game id, kind, then four signed 16 bit fields whose meaning depends on the kind (see below).
+RECORD = struct.Struct('<IBx4h2x')
+
+NEW_GAME = 1  # rows, cols, number of atoms that follow, precompute flag.
+ATOM = 2  # row, col of one atom of the game created just before.
+SHOT_HIT = 3  # entry row, entry col, row and col of the atom that was hit.
+SHOT_EXIT = 4  # entry row, entry col, exit row, exit col.
+SHOT_INVALID = 5  # entry row, entry col of a shot that shoot_ray turned down.
+GUESS = 6  # row, col, 1 if the guess was right and 0 if not.
+
+_FIELD_RANGE = range(-1 << 15, 1 << 15)  # values that fit in a signed 16 bit field.
+
+
+def _fits(*values):
+    """ Helper function that returns True if every value fits in a signed 16 bit field of a record. """
+    return all(value in _FIELD_RANGE for value in values)
+
+
+class RecordedGame:
+    """ This class wraps a BlackBoxGame so that every shot and guess is written to a BlackBoxEventLog. It has the same
+    shoot_ray, guess_atom, get_score and get_atoms_left methods as the game it wraps. """
+
+    __slots__ = ('_game_id', '_game', '_log')
+
+    def __init__(self, game_id, game, log):
+        """ Init method that wraps game, which is recorded under game_id in log. Use BlackBoxEventLog.new_game. """
+        self._game_id = game_id
+        self._game = game
+        self._log = log
+
+    def get_game(self):
+        """ This method returns the BlackBoxGame being recorded. """
+        return self._game
+
+    def shoot_ray(self, row, col):
+        """ This method shoots a ray just like BlackBoxGame.shoot_ray and records the shot and how the ray ended.
+        Shots from outside the board that do not fit in a record are turned down without being recorded, since they
+        do not change the game. """
+        game = self._game
+        if not game.is_valid_entry(row, col):
+            if _fits(row, col):
+                self._log.append(self._game_id, SHOT_INVALID, row, col)
+            return False
+        hit_atom, exit_position = game.ray_outcome(row, col)
+        if hit_atom is not None:
+            self._log.append(self._game_id, SHOT_HIT, row, col, hit_atom[0], hit_atom[1])
+        else:
+            self._log.append(self._game_id, SHOT_EXIT, row, col, exit_position[0], exit_position[1])
+        return game.score_ray(row, col, hit_atom, exit_position)
+
+    def guess_atom(self, row, col):
+        """ This method guesses an atom just like BlackBoxGame.guess_atom and records the guess. Raises ValueError
+        without changing the game if row or col does not fit in a record. """
+        if not _fits(row, col):
+            raise ValueError('guess (%r, %r) does not fit in a record' % (row, col))
+        correct = self._game.guess_atom(row, col)
+        self._log.append(self._game_id, GUESS, row, col, int(correct))
+        return correct
+
+    def get_score(self):
+        """ This method returns the score of the recorded game. """
+        return self._game.get_score()
+
+    def get_atoms_left(self):
+        """ This method returns how many atoms are left in the recorded game. """
+        return self._game.get_atoms_left()
+
+
+class BlackBoxEventLog:
+    """ This class appends game events to a log file. New records only ever go on the end of the file, and a file
+    that already exists is added to rather than replaced. Records are buffered, so call flush or close (or use the
+    log in a with statement) to make sure they are on disk. """
+
+    def __init__(self, path, buffer_size=1 << 16):
+        """ Init method that opens the log at path, writing the file header if the file is new or empty. A partly
+        written record at the end of an existing log (from a crash mid-write) is cut off first, so that new records
+        line up with the old ones. """
+        _trim_partial_record(path)
+        self._file = open(path, 'ab', buffering=buffer_size)
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def new_game(self, game_id, atom_list, precompute=False, size=10):
+        """ This method creates a BlackBoxGame, records it under game_id and returns it wrapped in a RecordedGame so
+        its shots and guesses are recorded too. game_id must fit in 32 bits and be unique within the log. Raises
+        ValueError before anything is written if the game does not fit in the log's records. """
+        game = BlackBoxGame(atom_list, precompute, size)
+        rows, cols = game.get_size()
+        if not 0 <= game_id < 1 << 32:
+            raise ValueError('game id %r does not fit in 32 bits' % (game_id,))
+        if not _fits(rows, cols, len(atom_list), *(value for atom in atom_list for value in atom)):
+            raise ValueError('game %d does not fit in the records of the log' % game_id)
+        self.append(game_id, NEW_GAME, rows, cols, len(atom_list), int(precompute))
+        for atom in atom_list:
+            self.append(game_id, ATOM, atom[0], atom[1])
+        return RecordedGame(game_id, game, self)
+
+    def append(self, game_id, kind, a=0, b=0, c=0, d=0):
+        """ This method writes a single record to the end of the log. """
+        self._file.write(RECORD.pack(game_id, kind, a, b, c, d))
+
+    def flush(self):
+        """ This method writes any buffered records to the file and asks the operating system to store them. """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        """ This method flushes and closes the log. """
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+
+def _trim_partial_record(path):
+    """ Helper function that cuts a partly written record off the end of the log at path, if there is a log there.
+    A file holding only part of the header is emptied so the header is written again. Raises ValueError if the file is
+    not a Black Box event log. """
+    try:
+        log_file = open(path, 'r+b')
+    except FileNotFoundError:
+        return
+    with log_file:
+        size = os.fstat(log_file.fileno()).st_size
+        header = log_file.read(len(MAGIC))
+        if len(header) < len(MAGIC) and MAGIC.startswith(header):
+            log_file.truncate(0)
+        elif header != MAGIC:
+            raise ValueError('%s is not a Black Box event log' % path)
+        elif (size - len(MAGIC)) % RECORD.size:
+            log_file.truncate(size - (size - len(MAGIC)) % RECORD.size)
+
+
+def iter_events(path):
+    """ This function yields every record in the log at path as a (game id, kind, a, b, c, d) tuple, reading the file
+    through a memory map. A partly written record at the end of the file (from a crash mid-write) is ignored. """
+    with open(path, 'rb') as log_file:
+        if os.fstat(log_file.fileno()).st_size <= len(MAGIC):
+            return
+        with mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if mapped[:len(MAGIC)] != MAGIC:
+                raise ValueError('%s is not a Black Box event log' % path)
+            end = len(MAGIC) + (len(mapped) - len(MAGIC)) // RECORD.size * RECORD.size
+            view = memoryview(mapped)[len(MAGIC):end]
+            try:
+                yield from RECORD.iter_unpack(view)
+            finally:
+                view.release()
+
+
+def replay(path, game_ids=None):
+    """ This function rebuilds games from the log at path and returns a dictionary that maps each game id to a
+    BlackBoxGame in the state it was in after its last recorded event. If game_ids is given, only those games are
+    rebuilt. Shots are played back from their recorded outcome with BlackBoxGame.score_ray, so the games are created
+    without precomputed ray outcomes. """
+    games = {}
+    pending = {}  # games whose atoms are still being read, as game id -> (atoms, rows, cols).
+    wanted = None if game_ids is None else set(game_ids)
+    for game_id, kind, a, b, c, d in iter_events(path):
+        if wanted is not None and game_id not in wanted:
+            continue
+        if kind == ATOM:
+            pending[game_id][0].append((a, b))
+            continue
+        if game_id in pending:
+            atoms, rows, cols = pending.pop(game_id)
+            games[game_id] = BlackBoxGame(atoms, size=(rows, cols))
+        if kind == SHOT_HIT:
+            games[game_id].score_ray(a, b, (c, d), None)
+        elif kind == SHOT_EXIT:
+            games[game_id].score_ray(a, b, None, (c, d))
+        elif kind == GUESS:
+            games[game_id].guess_atom(a, b)
+        elif kind == NEW_GAME:
+            pending[game_id] = ([], a, b)
+        elif kind != SHOT_INVALID:
+            raise ValueError('unknown event kind %d for game %d' % (kind, game_id))
+    for game_id, (atoms, rows, cols) in pending.items():
+        games[game_id] = BlackBoxGame(atoms, size=(rows, cols))  # games with no events after their atoms.
+    return games
@@ -4,64 +4,213 @@
 # try to shoot rays into the black box in order to try and hit the atoms inside. There must be at at least one atom
 # on the board to start.
 
+import functools
+import time
+
+# Bits used by the neighbour masks. Each bit stands for one of the 8 cells around a ray's position and is set when
+# that cell contains an atom, so a single lookup tells the move_ray_(left, right, up, down) methods everything.
+ATOM_TOP_LEFT = 1
+ATOM_ABOVE = 2
+ATOM_TOP_RIGHT = 4
+ATOM_ON_LEFT = 8
+ATOM_ON_RIGHT = 16
+ATOM_BOTTOM_LEFT = 32
+ATOM_BELOW = 64
+ATOM_BOTTOM_RIGHT = 128
+
+# (row offset, column offset) of every neighbouring cell along with the bit that represents it.
+NEIGHBOUR_OFFSETS = [((-1, -1), ATOM_TOP_LEFT), ((-1, 0), ATOM_ABOVE), ((-1, 1), ATOM_TOP_RIGHT),
+                     ((0, -1), ATOM_ON_LEFT), ((0, 1), ATOM_ON_RIGHT),
+                     ((1, -1), ATOM_BOTTOM_LEFT), ((1, 0), ATOM_BELOW), ((1, 1), ATOM_BOTTOM_RIGHT)]
+
+# how a ray moving in each direction goes through the board: its (row step, col step), the bit of the atom straight
+# ahead of it, and the two bits diagonally ahead of it, each with the direction the ray turns to when only that one is
+# set. When both are set the ray goes back in the last direction. Both _ray_steps and the move_ray_(left, right, up,
+# down) methods move rays by this table.
+_RAY_MOVES = {
+    'RIGHT': ((0, 1), ATOM_ON_RIGHT, ATOM_BOTTOM_RIGHT, 'UP', ATOM_TOP_RIGHT, 'DOWN', 'LEFT'),
+    'LEFT': ((0, -1), ATOM_ON_LEFT, ATOM_BOTTOM_LEFT, 'UP', ATOM_TOP_LEFT, 'DOWN', 'RIGHT'),
+    'UP': ((-1, 0), ATOM_ABOVE, ATOM_TOP_LEFT, 'RIGHT', ATOM_TOP_RIGHT, 'LEFT', 'DOWN'),
+    'DOWN': ((1, 0), ATOM_BELOW, ATOM_BOTTOM_LEFT, 'RIGHT', ATOM_BOTTOM_RIGHT, 'LEFT', 'UP'),
+}
+
+
+@functools.lru_cache(maxsize=256)
+def edge_positions(rows, cols):
+    """ This function returns the set of positions on the edge of a rows x cols board that rays can be shot from and
+    exit through (every edge cell except the 4 corners). The sets of the most recently used sizes are cached, so
+    callers of the same size share them without every size ever used staying in memory. """
+    positions = set()
+    for col in range(1, cols - 1):
+        positions.add((0, col))
+        positions.add((rows - 1, col))
+    for row in range(1, rows - 1):
+        positions.add((row, 0))
+        positions.add((row, cols - 1))
+    return frozenset(positions)
+
+
+@functools.lru_cache(maxsize=4096)
+def layout_tables(atoms):
+    """ This function takes a tuple of atoms and returns a (atom cells, neighbour masks) tuple. The atom cells are a
+    dictionary that maps each atom to where it first appears in the tuple, and the neighbour masks are a dictionary
+    that maps a cell to the bitmask of ATOM_* bits of the atoms around it (cells with no atoms around them are left
+    out). The result is cached, so games with the same atoms share it and it must not be changed. """
+    atom_cells = {}
+    for index, atom in enumerate(atoms):
+        atom_cells.setdefault(atom, index)
+    masks = {}
+    for atom in atom_cells:
+        for offset, bit in NEIGHBOUR_OFFSETS:
+            # the atom sits at this offset from the cell on the opposite side of it.
+            cell = (atom[0] - offset[0], atom[1] - offset[1])
+            masks[cell] = masks.get(cell, 0) | bit
+    return atom_cells, masks
+
+
+class RayTrace:
+    """ This class records what happened to a single ray when a trace hook is set on a BlackBoxGame. It lists every
+    cell the ray visited, every change of direction along with the atoms that caused it, how the ray ended, and
+    counters for the number of steps, neighbour lookups and the wall time the shot took. """
+
+    __slots__ = ('entry', 'cells', 'turns', 'hit_atom', 'exit_position', 'result', 'steps', 'neighbour_lookups',
+                 'wall_time')
+
+    def __init__(self, entry):
+        """ Init method that starts an empty trace for a ray shot from entry. """
+        self.entry = entry
+        self.cells = [entry]  # every cell the ray was in, in order.
+        self.turns = []  # (position, old direction, new direction, atoms that caused the turn) for every turn.
+        self.hit_atom = None  # the atom that stopped the ray, if there was a hit.
+        self.exit_position = None  # where the ray left the board, if there was no hit.
+        self.result = None  # what shoot_ray returned.
+        self.steps = 0  # number of times the ray was moved or turned.
+        self.neighbour_lookups = 0  # number of times the atoms around the ray were looked up.
+        self.wall_time = 0.0  # seconds the whole shot took, scoring included.
+
+    def __repr__(self):
+        """ Returns a short summary of the trace for logging. """
+        return 'RayTrace(entry=%r, result=%r, steps=%d, turns=%d, wall_time=%.2gs)' % (
+            self.entry, self.result, self.steps, len(self.turns), self.wall_time)
+
 
 class BlackBoxGame:
     """ This class is a virtual representation of the Black Box Game. Users can utilize the various methods in this
-    class to play the game. The game will take place on a 10x10 grid where the atoms must be placed somewhere on rows
-    1-8 and columns 1-8. Rays must be shot from rows 0 and 9 and columns 0 and 9 (corner locations are not allowed). """
-
-    def __init__(self, atom_list):
+    class to play the game. By default the game will take place on a 10x10 grid where the atoms must be placed somewhere
+    on rows 1-8 and columns 1-8. Rays must be shot from rows 0 and 9 and columns 0 and 9 (corner locations are not
+    allowed). Bigger or rectangular boards work the same way, with the last row and column taking the place of 9. """
+
+    # the game keeps its state in a few slots: the layout tables are shared between games with the same atoms or
+    # board size, the used entry/exit points and the hit atoms are integer bitsets with one bit per entry point and
+    # one bit per atom, and the guesses are a frozenset. None of them grow with the area of the board.
+    __slots__ = ('_rows', '_cols', '_score', '_atoms', '_atom_cells', '_neighbour_masks',
+                 '_used_positions', '_guesses', '_hit_atoms', '_direction',
+                 '_current_position', '_was_there_a_hit', '_hit_atom', '_ray_outcomes',
+                 '_trace_hook')
+
+    def __init__(self, atom_list, precompute=False, size=10):
         """ Init method that initializes the game with various private data members. The methods of the BlackBoxGame
-        class utilize these private data members to update and play the game. """
-        self._board = [
-            # 0   #1  #2  #3  #4  #5  #6  #7  #8   #9
-            ['', '', '', '', '', '', '', '', '', ''],  # 0
-
-            ['', '', '', '', '', '', '', '', '', ''],  # 1
-            ['', '', '', '', '', '', '', '', '', ''],  # 2
-            ['', '', '', '', '', '', '', '', '', ''],  # 3
-            ['', '', '', '', '', '', '', '', '', ''],  # 4
-            ['', '', '', '', '', '', '', '', '', ''],  # 5
-            ['', '', '', '', '', '', '', '', '', ''],  # 6
-            ['', '', '', '', '', '', '', '', '', ''],  # 7
-            ['', '', '', '', '', '', '', '', '', ''],  # 8
-
-            ['', '', '', '', '', '', '', '', '', '']  # 9
-        ]
+        class utilize these private data members to update and play the game. If precompute is True, the outcome of
+        every entry point is worked out once here so that shoot_ray only has to look the result up. The size is
+        either a single number for a square board or a (rows, cols) tuple, and counts the edge rows and columns. """
+        if isinstance(size, int):
+            size = (size, size)
+        self._rows, self._cols = size  # size of the board including the edge rows and columns rays are shot from.
         self._score = 25
         self._atoms = atom_list  # all atoms that have been inserted into the game.
-        self._guessed_locations = set()  # will not contain duplicate locations.
+        # same atoms, but with constant time membership checks, and the neighbour masks the ray moves by. Both are
+        # shared by every game with the same atoms.
+        self._atom_cells, self._neighbour_masks = layout_tables(tuple(atom_list))
+        self._used_positions = 0  # bitset of the entry/exit points of rays (no repeats), see edge_bit.
+        self._guesses = frozenset()  # every location that has been guessed (will not contain duplicates).
+        self._hit_atoms = 0  # bitset of the atoms that have been hit, see atom_bit.
+        # the next four are only used when a ray is stepped by hand with the move_ray_(left, right, up, down) methods,
+        # shoot_ray keeps the state of its ray in local variables.
         self._direction = None  # determines which direction the ray is moving.
-        self._exit_positions = [(0, 1), (0, 2), (0, 3), (0, 4), (0, 5), (0, 6), (0, 7), (0, 8),
-                                (9, 1), (9, 2), (9, 3), (9, 4), (9, 5), (9, 6), (9, 7), (9, 8),
-                                (1, 0), (2, 0), (3, 0), (4, 0), (5, 0), (6, 0), (7, 0), (8, 0),
-                                (1, 9), (2, 9), (3, 9), (4, 9), (5, 9), (6, 9), (7, 9), (8, 9)]
-        self._hit_atoms = []
-        self._used_positions = set()  # contains the entry/exit points of rays (no repeats).
-        self._initial_position = None  # initial position of the ray.
         self._current_position = None  # current position of the ray.
-        self._was_there_a_hit = False
+        self._was_there_a_hit = False  # True if the last step hit an atom.
+        self._hit_atom = None  # atom that the last step hit, if any.
+        self._ray_outcomes = None  # maps each entry point to its (hit atom, exit position) pair.
+        self._trace_hook = None  # called with a RayTrace after every shot, if set.
+        if precompute:
+            self.precompute_ray_outcomes()
+
+    def snapshot(self):
+        """ This method returns the part of the game that changes while playing (score, used entry/exit points,
+        guesses and hit atoms) as an immutable tuple. Nothing is copied, so this is cheap enough to call before every
+        move for undo or look-ahead. """
+        return self._score, self._used_positions, self._guesses, self._hit_atoms
+
+    def restore(self, snapshot):
+        """ This method puts the game back to the state saved by snapshot. The snapshot can be restored any number of
+        times, and can also be restored into a clone of the game it came from. """
+        self._score, self._used_positions, self._guesses, self._hit_atoms = snapshot
+
+    def clone(self):
+        """ This method returns a new game in the same state as this one. The layout tables are shared, and since the
+        changing state is held in immutable values, each game only gets its own copy once it is played. """
+        game = type(self).__new__(type(self))
+        for name in BlackBoxGame.__slots__:
+            setattr(game, name, getattr(self, name))
+        return game
+
+    def set_trace_hook(self, hook):
+        """ This method sets a function that is called with a RayTrace after every shot, or removes it if hook is
+        None. While a hook is set, rays are always moved through the board (even with precomputed outcomes) so the
+        trace can list their path. Without a hook, shoot_ray does no tracing work at all. """
+        self._trace_hook = hook
+
+    def edge_bit(self, position):
+        """ This method returns the bit that stands for the given (row, col) entry/exit point in the used positions
+        bitset, or 0 if the position is not one. Entry points are numbered along the top edge, then the bottom edge,
+        then the left edge and then the right edge. """
+        row, col = position
+        rows, cols = self._rows, self._cols
+        if (row == 0 or row == rows - 1) and 0 < col < cols - 1:
+            index = col - 1 if row == 0 else cols - 3 + col
+        elif (col == 0 or col == cols - 1) and 0 < row < rows - 1:
+            index = 2 * (cols - 2) + (row - 1 if col == 0 else rows - 3 + row)
+        else:
+            return 0
+        return 1 << index
+
+    def atom_bit(self, atom):
+        """ This method returns the bit that stands for the given atom in the hit atoms bitset, or 0 if there is no
+        atom at that position. Atoms are numbered in the order they were passed to the game. """
+        index = self._atom_cells.get(atom)
+        if index is None:
+            return 0
+        return 1 << index
 
     def get_score(self):
         """ This method returns the user's score via the private data member in the init method."""
         return self._score
 
+    def get_size(self):
+        """ This method returns the size of the board as a (rows, cols) tuple, including the edge rows and columns."""
+        return self._rows, self._cols
+
     def get_atoms_left(self):
         """ This method communicates with the init method to return how many atoms are left on the board."""
-        return len(self._atoms) - len(self._hit_atoms)
+        return len(self._atoms) - self._hit_atoms.bit_count()
 
     def set_direction(self, coordinates):
         """ This method accepts the coordinates of the current position to determine which direction the ray will be
         travelling. Will be updated depending on interactions with atoms. Coordinates accepted as (row, col)."""
+        self._direction = self.entry_direction(coordinates)
+
+    def entry_direction(self, coordinates):
+        """ This method returns the direction ('UP', 'DOWN', 'LEFT' or 'RIGHT') a ray shot from the given (row, col)
+        edge position starts out in, without changing the game. """
         # coordinates[0] represents the row and coordinates[1] represents the column
         if coordinates[0] == 0:
-            self._direction = 'DOWN'
-        elif coordinates[0] == 9:
-            self._direction = 'UP'
+            return 'DOWN'
+        elif coordinates[0] == self._rows - 1:
+            return 'UP'
         elif coordinates[1] == 0:
-            self._direction = 'RIGHT'
+            return 'RIGHT'
         else:
-            self._direction = 'LEFT'
+            return 'LEFT'
 
     def moving_left(self):
         """ Method that checks the directional private data member and returns True if the direction is
@@ -115,265 +264,283 @@ class BlackBoxGame:
         interacts with an atom, whether that be a reflection, deflection, or double deflection. """
         self._direction = 'DOWN'
 
+    def neighbours(self, current_position):
+        """ This method returns the bitmask of atoms surrounding the given position, built from the ATOM_* bits at the
+        top of this file. The move_ray_(left, right, up, down) methods call it once per step of the ray. """
+        return self._neighbour_masks.get(current_position, 0)
+
     def has_atom_on_right(self, current_position):
         """ Within each movement of the ray through the board, this method will be called to check if there is an atom
         on the right side of the current ray's position. Returns True if there is, False if there isn't. """
-        next_position = (current_position[0], current_position[1] + 1)  # right position is just column + 1.
-        for atom in self._atoms:
-            if next_position == atom:
-                return True
-        return False
+        return self.neighbours(current_position) & ATOM_ON_RIGHT != 0
 
     def has_atom_on_left(self, current_position):
         """ Within each movement of the ray through the board, this method will be called to check if there is an atom
         on the left side of the current ray's position. Returns True if there is, False if there isn't. """
-        next_position = (current_position[0], current_position[1] - 1)  # left position is just column - 1.
-        for atom in self._atoms:
-            if next_position == atom:
-                return True
-        return False
+        return self.neighbours(current_position) & ATOM_ON_LEFT != 0
 
     def has_atom_top_right(self, current_position):
         """ Within each movement of the ray through the board, this method will be called to check if there is an atom
         on the upper right side of the current ray's position. Returns True if there is, False if there isn't. """
-        next_position = (current_position[0] - 1, current_position[1] + 1)  # row - 1 and column + 1.
-        for atom in self._atoms:
-            if next_position == atom:
-                return True
-        return False
+        return self.neighbours(current_position) & ATOM_TOP_RIGHT != 0
 
     def has_atom_top_left(self, current_position):
         """ Within each movement of the ray through the board, this method will be called to check if there is an atom
         on the upper left side of the current ray's position. Returns True if there is, False if there isn't. """
-        next_position = (current_position[0] - 1, current_position[1] - 1)  # row - 1 and column - 1
-        for atom in self._atoms:
-            if next_position == atom:
-                return True
-        return False
+        return self.neighbours(current_position) & ATOM_TOP_LEFT != 0
 
     def has_atom_above(self, current_position):
         """ Within each movement of the ray through the board, this method will be called to check if there is an atom
         right above the current ray's position. Returns True if there is, False if there isn't. """
-        next_position = (current_position[0] - 1, current_position[1])  # row - 1 to check above, column stays the same.
-        for atom in self._atoms:
-            if next_position == atom:
-                return True
-        return False
+        return self.neighbours(current_position) & ATOM_ABOVE != 0
 
     def has_atom_below(self, current_position):
         """ Within each movement of the ray through the board, this method will be called to check if there is an atom
         directly below the current ray's position. Returns True if there is, False if there isn't. """
-        next_position = (current_position[0] + 1, current_position[1])  # row + 1 to check below, column stays the same.
-        for atom in self._atoms:
-            if next_position == atom:
-                return True
-        return False
+        return self.neighbours(current_position) & ATOM_BELOW != 0
 
     def has_atom_bottom_left(self, current_position):
         """ Within each movement of the ray through the board, this method will be called to check if there is an atom
         on the lower left side of the current ray's position. Returns True if there is, False if there isn't. """
-        next_position = (current_position[0] + 1, current_position[1] - 1)  # row + 1 and col - 1.
-        for atom in self._atoms:
-            if next_position == atom:
-                return True
-        return False
+        return self.neighbours(current_position) & ATOM_BOTTOM_LEFT != 0
 
     def has_atom_bottom_right(self, current_position):
         """ Within each movement of the ray through the board, this method will be called to check if there is an atom
         on the lower right side of the current ray's position. Returns True if there is, False if there isn't. """
-        next_position = (current_position[0] + 1, current_position[1] + 1)  # col + 1 and row + 1
-        for atom in self._atoms:
-            if next_position == atom:
-                return True
-        return False
+        return self.neighbours(current_position) & ATOM_BOTTOM_RIGHT != 0
 
     def shoot_ray(self, row, col):
         """ This method accepts a specific row and col position for the initial input location of the ray and returns
         False if the input location is not valid, None if there is a hit, or a tuple containing the exit location of
         the ray. This method calls a series of helper methods to move the ray through the board. """
-
+        if not self.is_valid_entry(row, col):
+            return False
+        if self._trace_hook is not None:
+            return self._shoot_traced_ray(row, col)
+        hit_atom, exit_position = self.ray_outcome(row, col)
+        return self.score_ray(row, col, hit_atom, exit_position)
+
+    def is_valid_entry(self, row, col):
+        """ This method returns True if a ray can be shot from (row, col), which must be on exactly one edge of the
+        board (corner locations are not allowed). """
+        edge_rows = [0, self._rows - 1]
+        edge_cols = [0, self._cols - 1]
         # if row and col are both edges, then it's a corner.
-        if col in [0, 9] and row in [0, 9]:
+        if col in edge_cols and row in edge_rows:
             return False
         # if neither row nor col is on the edge, then you can't shoot a ray from there either.
-        elif col not in [0, 9] and row not in [0, 9]:
+        elif col not in edge_cols and row not in edge_rows:
             return False
-        # if either row or col is outside of the 0-9 range, it's invalid.
-        elif col not in range(0, 10) or row not in range(0, 10):
+        # if either row or col is outside of the board, it's invalid.
+        elif col not in range(0, self._cols) or row not in range(0, self._rows):
             return False
-        else:
-            self._current_position = (row, col)
-            self._initial_position = (row, col)
-            self.set_direction(self._current_position)  # sets the direction depending on what side ray starts.
-            first_move = True
-            while self._current_position not in self._exit_positions or (first_move == True):
-                # this loop keeps running as long as the entry ray has not exited the board yet.
-                first_move = False
-                if self._was_there_a_hit:
-                    break  # if there was a hit, ray never exits so this break is needed.
-                if self.moving_right():  # calls helper method to determine the direction of the ray.
-                    self.move_ray_right(self._current_position)
-
-                elif self.moving_left():
-                    self.move_ray_left(self._current_position)
-
-                elif self.moving_up():
-                    self.move_ray_up(self._current_position)
-
-                elif self.moving_down():
-                    self.move_ray_down(self._current_position)
-
-            if self._was_there_a_hit:
-                return None
+        return True
+
+    def ray_outcome(self, row, col):
+        """ This method returns the (hit atom, exit position) of a ray shot from the valid entry point (row, col)
+        without touching the score, from the precomputed table if there is one. """
+        if self._ray_outcomes is not None:
+            return self._ray_outcomes[(row, col)]
+        return self.trace_ray(row, col)
+
+    def score_ray(self, row, col, hit_atom, exit_position):
+        """ This method updates the score for a ray shot from (row, col) that ended with the given hit atom or exit
+        position (as returned by ray_outcome), and returns what shoot_ray would return. It lets a recorded shot be
+        played back without moving the ray through the board again. """
+        if hit_atom is not None:
+            self.hit(hit_atom, (row, col))
+            return None
+        return self.handle_exit((row, col), exit_position)  # returns the exit point of the ray.
+
+    def trace_ray(self, row, col):
+        """ This method moves a ray from a valid entry point through the board without touching the score. It returns
+        a tuple of (hit atom, exit position) where the hit atom is None if the ray made it out of the board, and the
+        exit position is None if the ray hit an atom. """
+        for event, position, _ in self._ray_steps((row, col)):
+            if event == 'HIT':
+                return position, None  # if there was a hit, ray never exits so we can stop here.
+        return None, position
+
+    def iter_ray(self, row, col):
+        """ This method returns a generator that moves a ray shot from (row, col) through the board one step at a
+        time, without touching the score. It yields an (event, position, direction) tuple for every step:
+        ('ENTER', entry point, direction) first, then ('MOVE', new position, direction) each time the ray moves a
+        cell and ('TURN', position, new direction) each time an atom turns it, and last either ('HIT', atom,
+        direction) or ('EXIT', exit point, direction). The generator only keeps its own local state, so any number of
+        rays can be stepped through the same game at once, and it can be dropped before the ray is done. Raises
+        ValueError if (row, col) is not a valid entry point. """
+        if not self.is_valid_entry(row, col):
+            raise ValueError('(%r, %r) is not a valid entry point' % (row, col))
+        return self._ray_steps((row, col))
+
+    def _ray_steps(self, position):
+        """ Helper generator behind iter_ray, trace_ray and shoot_ray that moves a ray from an entry point known to be
+        valid. It looks up the atoms around the ray once per step, like the move_ray_(left, right, up, down) methods,
+        but keeps the position and direction in local variables instead of on the game. """
+        neighbour_masks = self._neighbour_masks
+        last_row = self._rows - 1
+        last_col = self._cols - 1
+        direction = self.entry_direction(position)
+        yield 'ENTER', position, direction
+        first_move = True
+        # a ray is only ever inside the board or on one of its edges, so it has exited once it is not inside.
+        while (0 < position[0] < last_row and 0 < position[1] < last_col) or first_move:
+            # this loop keeps running as long as the entry ray has not exited the board yet.
+            first_move = False
+            (row_step, col_step), ahead, side_a, turn_a, side_b, turn_b, back = _RAY_MOVES[direction]
+            neighbours = neighbour_masks.get(position, 0)
+            if neighbours & ahead:
+                yield 'HIT', (position[0] + row_step, position[1] + col_step), direction
+                return
+            if neighbours & side_a and neighbours & side_b:
+                direction = back  # double deflection, go back in the direction the ray came from.
+            elif neighbours & side_a:
+                direction = turn_a
+            elif neighbours & side_b:
+                direction = turn_b
             else:
-                return self.handle_exit()  # will return the current position which is the exit point of the ray.
-
-    def handle_exit(self):
-        """ Helper method that executes after the while loop has finished running. If the entry point of the ray is
-        equal to the exit point of the ray, that means the user's score will be deducted by 1. Contrarily, if
-        the entry/exit points are different, user's score will be deducted by 2 points. Entry and exit points
-        will only be counted once for point deduction."""
-        if self._initial_position == self._current_position:  # if it's a reflection or a double deflection.
-            if self._initial_position not in self._used_positions:
-                self._used_positions.add(self._current_position)
+                position = (position[0] + row_step, position[1] + col_step)
+                yield 'MOVE', position, direction
+                continue
+            yield 'TURN', position, direction
+        yield 'EXIT', position, direction
+
+    def _shoot_traced_ray(self, row, col):
+        """ Helper method used by shoot_ray while a trace hook is set. It moves the ray the same way trace_ray does,
+        but fills in a RayTrace along the way and passes it to the hook once the ray has been scored. """
+        start = time.perf_counter()
+        trace = RayTrace((row, col))
+        direction = None
+        for event, position, new_direction in self._ray_steps((row, col)):
+            if event == 'MOVE':
+                trace.cells.append(position)
+            elif event == 'TURN':
+                trace.turns.append((position, direction, new_direction, self._atoms_ahead(position, direction)))
+            elif event == 'HIT':
+                trace.hit_atom = position
+            elif event == 'EXIT':
+                trace.exit_position = position
+            if event != 'ENTER' and event != 'EXIT':
+                trace.steps += 1
+                trace.neighbour_lookups += 1  # every step looks up the neighbours once.
+            direction = new_direction
+        trace.result = self.score_ray(row, col, trace.hit_atom, trace.exit_position)
+        trace.wall_time = time.perf_counter() - start
+        self._trace_hook(trace)
+        return trace.result
+
+    def _atoms_ahead(self, position, direction):
+        """ Helper method that returns the atoms on the two cells diagonally ahead of a ray at position moving in
+        direction, which are the atoms that make it turn. """
+        row, col = position
+        if direction == 'RIGHT':
+            cells = [(row - 1, col + 1), (row + 1, col + 1)]
+        elif direction == 'LEFT':
+            cells = [(row - 1, col - 1), (row + 1, col - 1)]
+        elif direction == 'UP':
+            cells = [(row - 1, col - 1), (row - 1, col + 1)]
+        else:
+            cells = [(row + 1, col - 1), (row + 1, col + 1)]
+        return [cell for cell in cells if cell in self._atom_cells]
+
+    def precompute_ray_outcomes(self):
+        """ Since the atoms never move once the game has started, this method traces a ray from every entry point
+        and stores the (hit atom, exit position) results. After this has run, shoot_ray answers with a lookup in
+        this table instead of moving the ray through the board, while scoring works exactly the same. """
+        ray_outcomes = {}
+        for entry in edge_positions(self._rows, self._cols):
+            ray_outcomes[entry] = self.trace_ray(entry[0], entry[1])
+        self._ray_outcomes = ray_outcomes
+
+    def handle_exit(self, initial_position, exit_position):
+        """ Helper method that executes once a ray shot from initial_position has left the board at exit_position. If
+        the entry point of the ray is equal to the exit point of the ray, that means the user's score will be deducted
+        by 1. Contrarily, if the entry/exit points are different, user's score will be deducted by 2 points. Entry and
+        exit points will only be counted once for point deduction. Returns the exit position."""
+        initial_bit = self.edge_bit(initial_position)
+        current_bit = self.edge_bit(exit_position)
+        if initial_position == exit_position:  # if it's a reflection or a double deflection.
+            if not self._used_positions & initial_bit:
+                self._used_positions |= current_bit
                 self._score -= 1  # only deducted if entry point has never been used before.
-                return self._current_position
-            return self._current_position
+                return exit_position
+            return exit_position
         else:
-            if self._current_position not in self._used_positions and self._initial_position not in self._used_positions:
+            if not self._used_positions & current_bit and not self._used_positions & initial_bit:
                 # only enters here if both the entry/exit points of the ray have never been used before.
-                self._used_positions.add(self._current_position)
+                self._used_positions |= current_bit
                 self._score -= 2.  # ray was able to exit in a different spot
-                return self._current_position
-            return self._current_position
+                return exit_position
+            return exit_position
 
     def move_ray_right(self, current_position):
         """ Method for a ray that is moving right. It accepts the current position of the ray, and then checks all 4
         corners to see if there is an atom and change the direction of the ray accordingly. """
-        if self.has_atom_on_right(current_position):  # if the ray is moving right and there is an atom on the right,
-            # that means there is a hit.
-            self.hit((current_position[0], current_position[0] + 1))  # send the atom to the helper function.
-            self._was_there_a_hit = True
-            # print("has atom on right")
-
-        elif self.has_atom_bottom_right(current_position) and self.has_atom_top_right(current_position):
-            # this would be a double deflection
-            self.change_direction_to_left()  # go back in the direction the ray came from.
-            # print("dbl def, moving left")
-
-        elif self.has_atom_bottom_right(current_position):
-            self.change_direction_to_up()
-
-        elif self.has_atom_top_right(current_position):
-            self.change_direction_to_down()
-
-        else:
-            # ray can keep moving right
-            # move the current pos right one.
-            # print('can move right')
-            self._current_position = (current_position[0], current_position[1] + 1)
+        self._move_ray(current_position, 'RIGHT')
 
     def move_ray_left(self, current_position):
         """ Method for a ray that is moving left. It accepts the current position of the ray, and then checks all 4
         corners to see if there is an atom and change the direction of the ray accordingly. """
-        if self.has_atom_on_left(current_position):
-            self.hit((current_position[0], current_position[0] - 1))  # send the atom to the helper function
-            self._was_there_a_hit = True
-            # print("has atom on left")
-
-        elif self.has_atom_bottom_left(current_position) and self.has_atom_top_left(current_position):
-            # this would be a double deflection
-            self.change_direction_to_right()
-            # print("dbl def, moving right")
-
-        elif self.has_atom_bottom_left(current_position):
-            self.change_direction_to_up()
-
-        elif self.has_atom_top_left(current_position):
-            self.change_direction_to_down()
-
-        else:
-            # ray can keep moving left
-            # move the current pos left one.
-            # print('can move left')
-            self._current_position = (current_position[0], current_position[1] - 1)
+        self._move_ray(current_position, 'LEFT')
 
     def move_ray_up(self, current_position):
         """ Method for a ray that is moving up. It accepts the current position of the ray, and then checks all 4
         corners to see if there is an atom and change the direction of the ray accordingly. """
-        if self.has_atom_above(current_position):
-            self.hit((current_position[0] - 1, current_position[0]))  # send the atom to the helper function
-            self._was_there_a_hit = True
-            # print("has atom above")
-
-        elif self.has_atom_top_left(current_position) and self.has_atom_top_right(current_position):
-            # this would be a double deflection
-            self.change_direction_to_down()
-            # print("dbl def, moving down")
-
-        elif self.has_atom_top_left(current_position):
-            self.change_direction_to_right()
-
-        elif self.has_atom_top_right(current_position):
-            self.change_direction_to_left()
-
-        else:
-            # ray can keep moving up
-            # move the current pos up one.
-            # print('can move up')
-            self._current_position = (current_position[0] - 1, current_position[1])  # col stays the same
+        self._move_ray(current_position, 'UP')
 
     def move_ray_down(self, current_position):
         """ Method for a ray that is moving down. It accepts the current position of the ray, and then checks all 4
         corners to see if there is an atom and change the direction of the ray accordingly. """
-        # print("move ray down")
-        if self.has_atom_below(current_position):
-            self.hit((current_position[0] + 1, current_position[0]))  # send the atom to the helper function
+        self._move_ray(current_position, 'DOWN')
+
+    def _move_ray(self, current_position, direction):
+        """ Helper method behind the move_ray_(left, right, up, down) methods that takes a single step of a ray stepped
+        by hand, with the same rules as _ray_steps. A hit is stored in _hit_atom and _was_there_a_hit, which are
+        cleared again by a step that does not hit. """
+        (row_step, col_step), ahead, side_a, turn_a, side_b, turn_b, back = _RAY_MOVES[direction]
+        neighbours = self.neighbours(current_position)
+        self._was_there_a_hit = False
+        self._hit_atom = None
+        if neighbours & ahead:
+            self._hit_atom = (current_position[0] + row_step, current_position[1] + col_step)
             self._was_there_a_hit = True
-            # print("has atom below")
-
-        elif self.has_atom_bottom_left(current_position) and self.has_atom_bottom_right(current_position):
-            # this would be a double deflection
-            self.change_direction_to_up()
-            # print("dbl def, moving up")
-
-        elif self.has_atom_bottom_left(current_position):
-            self.change_direction_to_right()
-
-        elif self.has_atom_bottom_right(current_position):
-            self.change_direction_to_left()
-
+        elif neighbours & side_a and neighbours & side_b:
+            self._direction = back  # double deflection, go back in the direction the ray came from.
+        elif neighbours & side_a:
+            self._direction = turn_a
+        elif neighbours & side_b:
+            self._direction = turn_b
         else:
-            # ray can keep moving down
-            # move the current pos down one.
-            # print('can move down')
-            self._current_position = (current_position[0] + 1, current_position[1])
+            self._current_position = (current_position[0] + row_step, current_position[1] + col_step)
 
     def guess_atom(self, row, col):
         """ This method allows the user to guess the location of the atom. It accepts an row and a col location as the
-        input and utilizes the list of lists representing the board to determine if the guess is correct or not.
+        input and looks it up in the atom index of the game to determine if the guess is correct or not.
         If the guess is incorrect then the user will be penalized 5 points. """
 
         userGuess = (row, col)
-        if userGuess in self._atoms:
-            self._guessed_locations.add(userGuess)
+        if userGuess in self._atom_cells:
+            if userGuess not in self._guesses:
+                self._guesses = self._guesses | {userGuess}
             return True
         else:
-            if userGuess in self._guessed_locations:
+            if userGuess in self._guesses:
                 return False
             else:  # if this location has not been guessed before, and it is incorrect
-                self._guessed_locations.add(userGuess)
+                self._guesses = self._guesses | {userGuess}
                 self._score -= 5
                 return False
 
-    def hit(self, atom):
-        """ This method is called by the move_ray_(left, right, up, down) methods to determine if there was a hit.
-        There will be no exit array. If the entry point of the ray, that causes this hit, has never been used before,
-        then a user's score is decremented by 1. """
-        if atom not in self._hit_atoms:
-            self._hit_atoms.append(atom)  # if the atom has never been hit before, it is added to the list.
-            if self._initial_position not in self._used_positions:
-                self._used_positions.add(self._initial_position)
+    def hit(self, atom, initial_position):
+        """ This method is called by shoot_ray with the atom that a ray shot from initial_position hit on its way
+        through the board. There will be no exit array. If the entry point of the ray, that causes this hit, has never
+        been used before, then a user's score is decremented by 1. """
+        atom_bit = self.atom_bit(atom)
+        if not self._hit_atoms & atom_bit:
+            self._hit_atoms |= atom_bit  # if the atom has never been hit before, it is added to the bitset.
+            initial_bit = self.edge_bit(initial_position)
+            if not self._used_positions & initial_bit:
+                self._used_positions |= initial_bit
                 self._score -= 1
 
 
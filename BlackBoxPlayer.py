@@ -0,0 +1,250 @@
+# Description: Computer player for the Black Box game. The player keeps a BlackBoxSolver up to date with what it has
+# seen, draws a set of sample layouts that agree with it, and picks the next shot or guess by searching over what the
+# samples say could happen. Search results are kept in a bounded transposition table, and the search is deepened one
+# level at a time until the time budget for the move runs out. Playing a layout with it gives a "par score".
+
+import collections
+import random
+import time
+
+from BlackBoxGame import BlackBoxGame, edge_positions
+from BlackBoxSolver import BlackBoxSolver
+
+
+class _OutOfTime(Exception):
+    """ Raised inside the search when the time budget for a move has run out. """
+
+
+class BlackBoxPlayer:
+    """ This class picks moves that keep the expected final score of a game as high as possible, using the scoring
+    rules of BlackBoxGame: 1 point for a reflection or a hit, 2 for a ray that comes out somewhere else, 5 for a
+    wrong guess, and nothing for rays whose entry/exit points were already used. Moves are picked by averaging over a
+    set of sample layouts that agree with everything seen so far. """
+
+    def __init__(self, num_atoms, size=10, samples=16, time_budget=0.05, max_depth=4, table_size=100000,
+                 guess_threshold=0.9, seed=0):
+        """ Init method that sets up a player for a game with num_atoms atoms on a board of the given size. samples is
+        the number of sample layouts to search over, time_budget the number of seconds per move, max_depth the
+        deepest search to try, and table_size the number of positions the transposition table holds before it
+        drops the least recently used one. Cells are only considered for a guess once at least guess_threshold of
+        the samples have an atom there. """
+        self._num_atoms = num_atoms
+        self._size = size
+        self._entries = sorted(edge_positions(*self._board_size()))
+        self._num_samples = samples
+        self._time_budget = time_budget
+        self._max_depth = max_depth
+        self._table = collections.OrderedDict()  # transposition table, in least to most recently used order.
+        self._table_size = table_size
+        self._guess_threshold = guess_threshold
+        self._rng = random.Random(seed)
+        self._solver = BlackBoxSolver(num_atoms, size)
+        self._history = []  # every move made so far along with what was seen, as (move, observation).
+        self._sample_games = {}  # maps a sample id to a precomputed game for that sample layout.
+        self._sample_atoms = {}  # maps a sample id to the set of atoms of that sample layout.
+        self._samples = []  # (sample id, snapshot after the moves in history) of every sample still in play.
+        self._next_sample = 0
+        self._deadline = None
+
+    def _board_size(self):
+        """ Helper method that returns the (rows, cols) of the board. """
+        if isinstance(self._size, int):
+            return self._size, self._size
+        return self._size
+
+    def choose_move(self):
+        """ This method returns the next move as ('ray', row, col) or ('guess', row, col), or None if no move could
+        change anything. It searches one level deeper at a time until the time budget runs out and returns the best
+        move of the deepest search that finished. If not even the first level finishes in time, it returns the best
+        move that level had got to, or else a ray from an entry point that has not been shot from yet. """
+        # leave a little of the budget for finishing off the move that is being searched when time runs out.
+        self._deadline = time.perf_counter() + 0.8 * self._time_budget
+        self._refill_samples()
+        if not self._samples:
+            return self._fallback_move([])
+        best_move = None
+        order = None
+        for depth in range(1, self._max_depth + 1):
+            scored = []
+            try:
+                _, move, order = self._search_root(depth, order, scored)
+            except _OutOfTime:
+                if depth == 1:
+                    best_move = self._fallback_move(scored)
+                break
+            best_move = move
+            if move is None:
+                break
+        return best_move
+
+    def record(self, move, result, atoms_left=None):
+        """ This method tells the player what happened when move was played: result is what shoot_ray or guess_atom
+        returned, and atoms_left is get_atoms_left() afterwards (only needed for rays). """
+        kind, row, col = move
+        if kind == 'ray':
+            self._solver.observe_ray(row, col, result)
+        else:
+            self._solver.observe_guess(row, col, result)
+        observation = (result, atoms_left) if kind == 'ray' else result
+        samples = []
+        for sample_id, snapshot in self._samples:
+            new_snapshot, _, sample_observation = self._play(sample_id, snapshot, move)
+            if sample_observation == observation:
+                samples.append((sample_id, new_snapshot))
+        self._samples = samples
+        self._history.append((move, observation))
+
+    def play(self, game):
+        """ This method plays game until every atom has been hit or there is nothing left worth doing, and returns
+        the final score. """
+        while game.get_atoms_left() > 0:
+            move = self.choose_move()
+            if move is None:
+                break
+            kind, row, col = move
+            if kind == 'ray':
+                result = game.shoot_ray(row, col)
+                self.record(move, result, game.get_atoms_left())
+            else:
+                self.record(move, game.guess_atom(row, col))
+        return game.get_score()
+
+    def _refill_samples(self, attempts=4):
+        """ Helper method that tops the samples back up from the solver once too many of them have been ruled out.
+        New samples have every move made so far played on them, and are only kept if they would have shown the same
+        results (the solver does not know which atom a hit was on, so a few may not). """
+        for _ in range(attempts):
+            if len(self._samples) >= self._num_samples // 2:
+                break
+            for atoms in self._solver.sample_layouts(self._rng, self._num_samples - len(self._samples)):
+                sample_id = self._next_sample
+                self._next_sample += 1
+                self._sample_games[sample_id] = BlackBoxGame(atoms, True, self._size)
+                self._sample_atoms[sample_id] = frozenset(atoms)
+                snapshot = self._sample_games[sample_id].snapshot()
+                for move, observation in self._history:
+                    snapshot, _, sample_observation = self._play(sample_id, snapshot, move)
+                    if sample_observation != observation:
+                        break
+                else:
+                    self._samples.append((sample_id, snapshot))
+        live = {sample_id for sample_id, _ in self._samples}
+        for sample_id in list(self._sample_games):
+            if sample_id not in live:
+                del self._sample_games[sample_id]
+                del self._sample_atoms[sample_id]
+
+    def _play(self, sample_id, snapshot, move):
+        """ Helper method that plays move on a sample in the state given by snapshot, and returns the state after it,
+        the points it cost and what the player would have seen. """
+        game = self._sample_games[sample_id]
+        game.restore(snapshot)
+        kind, row, col = move
+        if kind == 'ray':
+            result = game.shoot_ray(row, col)
+            observation = (result, game.get_atoms_left())
+        else:
+            observation = game.guess_atom(row, col)
+        return game.snapshot(), snapshot[0] - game.get_score(), observation
+
+    def _candidate_moves(self, samples):
+        """ Helper method that returns the moves worth looking at for a set of samples: every entry point, plus a
+        guess at every cell that most of the samples have an atom on and that has not been guessed yet. """
+        moves = [('ray', row, col) for row, col in self._entries]
+        counts = collections.Counter()
+        for sample_id, _ in samples:
+            counts.update(self._sample_atoms[sample_id])
+        guessed = {(row, col) for (kind, row, col), _ in self._history if kind == 'guess'}
+        for cell, count in counts.items():
+            if count >= self._guess_threshold * len(samples) and cell not in guessed:
+                moves.append(('guess', cell[0], cell[1]))
+        return moves
+
+    def _fallback_move(self, scored):
+        """ Helper method that picks a move when the first level of the search ran out of time: the best of the
+        (expected cost, move) pairs in scored, or the first entry point that has not been shot from yet. """
+        if scored:
+            return min(scored, key=lambda pair: pair[0])[1]
+        shot = {(row, col) for (kind, row, col), _ in self._history if kind == 'ray'}
+        for row, col in self._entries:
+            if (row, col) not in shot:
+                return 'ray', row, col
+        return None
+
+    def _search_root(self, depth, order, scored):
+        """ Helper method that searches every candidate move to the given depth and returns (expected cost, best move,
+        moves ordered best first). order is the move order from the previous depth, tried first so that the best
+        move so far is always looked at before time runs out. Each (expected cost, move) is added to scored as soon as
+        it is known, so the caller still has them if time runs out. """
+        moves = self._candidate_moves(self._samples)
+        if order is not None:
+            rank = {move: index for index, move in enumerate(order)}
+            moves.sort(key=lambda move: rank.get(move, len(rank)))
+        for move in moves:
+            value = self._move_value(self._samples, move, depth)
+            if value is not None:
+                scored.append((value, move))
+        if not scored:
+            return self._leaf_value(self._samples), None, []
+        scored.sort(key=lambda pair: pair[0])
+        return scored[0][0], scored[0][1], [move for _, move in scored]
+
+    def _move_value(self, samples, move, depth):
+        """ Helper method that returns the expected points lost by playing move and then playing as well as possible
+        for depth - 1 more moves, or None if the move cannot change anything in any of the samples. """
+        if time.perf_counter() > self._deadline:
+            raise _OutOfTime()
+        groups = {}
+        total_cost = 0
+        changed = False
+        for sample_id, snapshot in samples:
+            new_snapshot, cost, observation = self._play(sample_id, snapshot, move)
+            total_cost += cost
+            changed = changed or new_snapshot[1:] != snapshot[1:]
+            groups.setdefault(observation, []).append((sample_id, new_snapshot))
+        if not changed and len(groups) == 1:
+            return None  # the move teaches nothing and scores nothing, so it is not worth making.
+        value = total_cost / len(samples)
+        for group in groups.values():
+            value += len(group) / len(samples) * self._state_value(group, depth - 1)
+        return value
+
+    def _state_value(self, samples, depth):
+        """ Helper method that returns the expected points still to be lost from the state the samples are in, looking
+        depth moves ahead. Results are kept in the transposition table. """
+        leaf_value = self._leaf_value(samples)
+        if depth == 0 or leaf_value == 0:  # out of depth, or every atom has been hit in every sample.
+            return leaf_value
+        key = (depth, tuple(sorted((sample_id, snapshot[1:]) for sample_id, snapshot in samples)))
+        value = self._table.get(key)
+        if value is not None:
+            self._table.move_to_end(key)
+            return value
+        best = None
+        for move in self._candidate_moves(samples):
+            move_value = self._move_value(samples, move, depth)
+            if move_value is not None and (best is None or move_value < best):
+                best = move_value
+        value = leaf_value if best is None else best
+        self._table[key] = value
+        if len(self._table) > self._table_size:
+            self._table.popitem(last=False)
+        return value
+
+    def _leaf_value(self, samples):
+        """ Helper method that estimates the points still to be lost when the search stops: every atom that has not
+        been hit yet will take at least one more ray, which costs 1 point from a new entry point. """
+        total = 0
+        for sample_id, snapshot in samples:
+            game = self._sample_games[sample_id]
+            game.restore(snapshot)
+            total += game.get_atoms_left()
+        return total / len(samples)
+
+
+def par_score(atom_list, size=10, **player_options):
+    """ This function plays the layout with a BlackBoxPlayer and returns the final score, which can be used as the
+    "par score" of the layout. Any extra keyword arguments are passed on to BlackBoxPlayer. """
+    game = BlackBoxGame(atom_list, size=size)
+    player = BlackBoxPlayer(game.get_atoms_left(), size, **player_options)
+    return player.play(game)
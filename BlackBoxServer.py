@@ -0,0 +1,335 @@
+# Description: Asyncio server that lets many players play Black Box games over TCP or Unix sockets, along with a load
+# generator client that measures latency and throughput. Every message is a frame made of a 4 byte big-endian length
+# followed by that many bytes of UTF-8 JSON. A request looks like {"id": 1, "op": "shoot_ray", "session": 3,
+# "args": [0, 2]} and the reply is {"id": 1, "ok": true, "result": [5, 9]} (or "ok": false with an "error").
+# Clients may send as many requests as they like without waiting; replies on a connection come back in order.
+
+import argparse
+import asyncio
+import functools
+import json
+import random
+import struct
+import time
+
+from BlackBoxGame import BlackBoxGame, edge_positions
+
+_HEADER = struct.Struct('>I')
+MAX_FRAME_SIZE = 1 << 20  # largest request the server will accept, in bytes.
+MAX_BOARD_SIZE = 256  # largest number of rows or columns a hosted game may have.
+
+
+class ProtocolError(Exception):
+    """ Raised when a peer sends something that is not a valid frame. """
+
+
+async def read_frame(reader):
+    """ This function reads one frame from the stream and returns the decoded JSON message, or None if the stream
+    was closed cleanly between frames. """
+    try:
+        header = await reader.readexactly(_HEADER.size)
+    except asyncio.IncompleteReadError as error:
+        if error.partial:
+            raise ProtocolError('connection closed in the middle of a frame header')
+        return None
+    (length,) = _HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise ProtocolError('frame of %d bytes is too large' % length)
+    try:
+        payload = await reader.readexactly(length)
+    except asyncio.IncompleteReadError:
+        raise ProtocolError('connection closed in the middle of a frame')
+    try:
+        return json.loads(payload)
+    except RecursionError:
+        raise ProtocolError('frame is nested too deeply')
+
+
+def encode_frame(message):
+    """ This function returns the bytes of a frame holding the given JSON message. """
+    payload = json.dumps(message, separators=(',', ':')).encode()
+    return _HEADER.pack(len(payload)) + payload
+
+
+class _Session:
+    """ One hosted game along with the lock that makes sure only one command runs on it at a time. """
+
+    __slots__ = ('game', 'lock')
+
+    def __init__(self, game):
+        """ Init method that wraps the game in a new session. """
+        self.game = game
+        self.lock = asyncio.Lock()
+
+
+class BlackBoxServer:
+    """ This class hosts Black Box games for any number of connections. Games are created with the "new" command and
+    played with the "shoot_ray", "guess_atom", "get_score" and "get_atoms_left" commands, which call the
+    BlackBoxGame methods of the same name. Games are created with precomputed ray outcomes on a worker thread, so
+    the commands that run on the event loop afterwards are only table lookups and never hold it up. Boards are
+    limited to MAX_BOARD_SIZE rows and columns, and a game is removed once the connection that created it closes. """
+
+    def __init__(self):
+        """ Init method that starts the server off with no sessions. """
+        self._sessions = {}
+        self._next_session = 1
+        self._servers = []
+
+    async def start_tcp(self, host='127.0.0.1', port=0):
+        """ This method starts listening on a TCP port and returns the (host, port) it ended up on. """
+        server = await asyncio.start_server(self._handle_connection, host, port)
+        self._servers.append(server)
+        return server.sockets[0].getsockname()[:2]
+
+    async def start_unix(self, path):
+        """ This method starts listening on a Unix socket at the given path. """
+        server = await asyncio.start_unix_server(self._handle_connection, path)
+        self._servers.append(server)
+
+    async def close(self):
+        """ This method stops listening and waits for the listeners to shut down. """
+        for server in self._servers:
+            server.close()
+        for server in self._servers:
+            await server.wait_closed()
+        self._servers = []
+
+    def get_session_count(self):
+        """ This method returns how many games are being hosted. """
+        return len(self._sessions)
+
+    async def _handle_connection(self, reader, writer):
+        """ Helper method that serves one connection, answering each request in the order it came in. The games the
+        connection created are removed when it closes. """
+        owned = set()  # ids of the sessions this connection created and has not closed.
+        try:
+            while True:
+                request = await read_frame(reader)
+                if request is None:
+                    break
+                writer.write(encode_frame(await self._handle_request(request, owned)))
+                # only wait for the peer when it has fallen behind, so pipelined replies go out together.
+                if writer.transport.get_write_buffer_size() > 1 << 16:
+                    await writer.drain()
+            await writer.drain()
+        except (ProtocolError, ValueError, ConnectionError):
+            pass  # a broken connection only affects itself.
+        finally:
+            for session_id in owned:
+                self._sessions.pop(session_id, None)
+            writer.close()
+
+    async def _handle_request(self, request, owned):
+        """ Helper method that runs a single request and returns the reply message. """
+        reply = {'id': request.get('id') if isinstance(request, dict) else None}
+        try:
+            reply['result'] = await self._run(request, owned)
+            reply['ok'] = True
+        except (KeyError, TypeError, ValueError, IndexError, OverflowError) as error:
+            reply['ok'] = False
+            reply['error'] = '%s: %s' % (type(error).__name__, error)
+        return reply
+
+    async def _run(self, request, owned):
+        """ Helper method that carries out the command in a request and returns its result. owned is the set of
+        sessions created by the connection the request came in on. """
+        op = request['op']
+        args = request.get('args', [])
+        if op == 'new':
+            atoms = [(int(row), int(col)) for row, col in args[0]]
+            size = _board_size(args[1] if len(args) > 1 else 10)
+            loop = asyncio.get_running_loop()
+            game = await loop.run_in_executor(None, functools.partial(BlackBoxGame, atoms, True, size))
+            session_id = self._next_session
+            self._next_session += 1
+            self._sessions[session_id] = _Session(game)
+            owned.add(session_id)
+            return session_id
+        if op == 'close':
+            owned.discard(request['session'])
+            return self._sessions.pop(request['session']) is not None
+
+        session = self._sessions[request['session']]
+        async with session.lock:
+            if op == 'shoot_ray':
+                return session.game.shoot_ray(int(args[0]), int(args[1]))
+            if op == 'guess_atom':
+                return session.game.guess_atom(int(args[0]), int(args[1]))
+            if op == 'get_score':
+                return session.game.get_score()
+            if op == 'get_atoms_left':
+                return session.game.get_atoms_left()
+        raise ValueError('unknown op: %r' % (op,))
+
+
+def _board_size(size):
+    """ Helper function that checks the size of a board sent by a client and returns it as a (rows, cols) tuple.
+    Raises ValueError if it is not a whole number or pair of whole numbers from 3 to MAX_BOARD_SIZE. """
+    rows, cols = (size, size) if isinstance(size, int) else size
+    for value in (rows, cols):
+        if not isinstance(value, int) or not 3 <= value <= MAX_BOARD_SIZE:
+            raise ValueError('board sizes must be whole numbers from 3 to %d' % MAX_BOARD_SIZE)
+    return rows, cols
+
+
+class BlackBoxClient:
+    """ This class is a small client for BlackBoxServer. Requests can be sent with send and their replies collected
+    later with receive, or both at once with call. """
+
+    def __init__(self, reader, writer):
+        """ Init method that wraps an open connection. Use connect_tcp or connect_unix to make one. """
+        self._reader = reader
+        self._writer = writer
+        self._next_id = 1
+
+    @classmethod
+    async def connect_tcp(cls, host, port):
+        """ This method opens a TCP connection to a server and returns a client for it. """
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    @classmethod
+    async def connect_unix(cls, path):
+        """ This method opens a Unix socket connection to a server and returns a client for it. """
+        reader, writer = await asyncio.open_unix_connection(path)
+        return cls(reader, writer)
+
+    def send(self, op, session=None, *args):
+        """ This method queues a request without waiting for its reply and returns the request id. """
+        request_id = self._next_id
+        self._next_id += 1
+        self._writer.write(encode_frame({'id': request_id, 'op': op, 'session': session, 'args': list(args)}))
+        return request_id
+
+    async def receive(self):
+        """ This method waits for the next reply and returns it as a dictionary. """
+        await self._writer.drain()
+        reply = await read_frame(self._reader)
+        if reply is None:
+            raise ConnectionError('server closed the connection')
+        return reply
+
+    async def call(self, op, session=None, *args):
+        """ This method sends a request, waits for its reply and returns the result, raising RuntimeError if the
+        server reported an error. """
+        self.send(op, session, *args)
+        reply = await self.receive()
+        if not reply['ok']:
+            raise RuntimeError(reply['error'])
+        return reply['result']
+
+    async def close(self):
+        """ This method closes the connection. """
+        self._writer.close()
+        await self._writer.wait_closed()
+
+
+async def run_load(connect, connections=16, sessions=64, requests=20000, pipeline=16, seed=0):
+    """ This function plays random games against a server and returns a dictionary with the number of requests, the
+    requests per second and the p50/p99 latency in milliseconds. connect is a coroutine function that returns a new
+    BlackBoxClient. Each connection creates its share of the sessions and then keeps pipeline requests in flight
+    until it has sent its share of the requests. """
+    rng = random.Random(seed)
+    entries = sorted(edge_positions(10, 10))
+    cells = [(row, col) for row in range(1, 9) for col in range(1, 9)]
+    latencies = []
+
+    async def worker():
+        client = await connect()
+        worker_rng = random.Random(rng.random())
+        session_ids = []
+        for _ in range(max(1, sessions // connections)):
+            session_ids.append(await client.call('new', None, worker_rng.sample(cells, 4)))
+        sent_at = {}
+        to_send = requests // connections
+        while to_send > 0 or sent_at:
+            while to_send > 0 and len(sent_at) < pipeline:
+                session = worker_rng.choice(session_ids)
+                roll = worker_rng.random()
+                if roll < 0.7:
+                    request_id = client.send('shoot_ray', session, *worker_rng.choice(entries))
+                elif roll < 0.8:
+                    request_id = client.send('guess_atom', session, *worker_rng.choice(cells))
+                elif roll < 0.9:
+                    request_id = client.send('get_score', session)
+                else:
+                    request_id = client.send('get_atoms_left', session)
+                sent_at[request_id] = time.perf_counter()
+                to_send -= 1
+            reply = await client.receive()
+            latencies.append(time.perf_counter() - sent_at.pop(reply['id']))
+        await client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(connections)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'requests_per_second': len(latencies) / elapsed,
+        'p50_ms': _percentile(latencies, 50) * 1000,
+        'p99_ms': _percentile(latencies, 99) * 1000,
+    }
+
+
+def _percentile(sorted_values, percent):
+    """ Helper function that returns the given percentile of an already sorted list (0 for an empty list). """
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * percent / 100))
+    return sorted_values[index]
+
+
+async def _serve(args):
+    """ Helper function for the "serve" command. """
+    server = BlackBoxServer()
+    if args.unix:
+        await server.start_unix(args.unix)
+        print('listening on', args.unix)
+    else:
+        print('listening on %s:%d' % await server.start_tcp(args.host, args.port))
+    await asyncio.Event().wait()
+
+
+async def _load(args):
+    """ Helper function for the "load" command. With --local a server is started in this process first. """
+    server = None
+    host, port = args.host, args.port
+    if args.local:
+        server = BlackBoxServer()
+        if args.unix:
+            await server.start_unix(args.unix)
+        else:
+            host, port = await server.start_tcp(host, 0)
+    if args.unix:
+        connect = functools.partial(BlackBoxClient.connect_unix, args.unix)
+    else:
+        connect = functools.partial(BlackBoxClient.connect_tcp, host, port)
+    result = await run_load(connect, args.connections, args.sessions, args.requests, args.pipeline)
+    if server is not None:
+        await server.close()
+    print(json.dumps(result, indent=2))
+
+
+def main():
+    """ Command line entry point with a "serve" command that runs the server and a "load" command that runs the
+    load generator against one. """
+    parser = argparse.ArgumentParser(description='Black Box game server and load generator.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    for name in ('serve', 'load'):
+        command = commands.add_parser(name)
+        command.add_argument('--host', default='127.0.0.1')
+        command.add_argument('--port', type=int, default=8765)
+        command.add_argument('--unix', help='path of a Unix socket to use instead of TCP')
+    load = commands.choices['load']
+    load.add_argument('--local', action='store_true', help='start a server in this process to test against')
+    load.add_argument('--connections', type=int, default=16)
+    load.add_argument('--sessions', type=int, default=1024)
+    load.add_argument('--requests', type=int, default=50000)
+    load.add_argument('--pipeline', type=int, default=16)
+    args = parser.parse_args()
+    asyncio.run(_serve(args) if args.command == 'serve' else _load(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+# Description: Monte-Carlo simulation of Black Box games. Random atom layouts are generated and played with scripted
+# strategies through BlackBoxGame.shoot_ray and BlackBoxGame.guess_atom to estimate the expected score and difficulty
+# of a layout size. Games are split into chunks that are spread across a process pool, and the results are folded into
+# running statistics as the chunks come back, so memory stays flat no matter how many games are simulated.
+
+import argparse
+import concurrent.futures
+import math
+import os
+import random
+
+from BlackBoxGame import BlackBoxGame, edge_positions
+
+
+class RunningStats:
+    """ This class keeps the count, mean, variance, minimum and maximum of a stream of numbers without storing the
+    numbers themselves (Welford's algorithm). Two RunningStats can be merged, which is how the results of the chunks
+    run by different processes are combined. """
+
+    def __init__(self):
+        """ Init method that starts the statistics off empty. """
+        self._count = 0
+        self._mean = 0.0
+        self._m2 = 0.0  # sum of squared differences from the mean.
+        self._min = None
+        self._max = None
+
+    def add(self, value):
+        """ This method adds a single value to the statistics. """
+        self._count += 1
+        delta = value - self._mean
+        self._mean += delta / self._count
+        self._m2 += delta * (value - self._mean)
+        if self._min is None or value < self._min:
+            self._min = value
+        if self._max is None or value > self._max:
+            self._max = value
+
+    def merge(self, other):
+        """ This method folds the values of another RunningStats into this one, as if they had all been added here. """
+        if other._count == 0:
+            return
+        if self._count == 0:
+            self._count, self._mean, self._m2 = other._count, other._mean, other._m2
+            self._min, self._max = other._min, other._max
+            return
+        count = self._count + other._count
+        delta = other._mean - self._mean
+        self._mean += delta * other._count / count
+        self._m2 += other._m2 + delta * delta * self._count * other._count / count
+        self._count = count
+        self._min = min(self._min, other._min)
+        self._max = max(self._max, other._max)
+
+    def get_count(self):
+        """ This method returns how many values have been added. """
+        return self._count
+
+    def get_mean(self):
+        """ This method returns the mean of the values, or None if there are none. """
+        return self._mean if self._count else None
+
+    def get_stdev(self):
+        """ This method returns the sample standard deviation of the values, or None if there are less than two. """
+        if self._count < 2:
+            return None
+        return math.sqrt(self._m2 / (self._count - 1))
+
+    def to_dict(self):
+        """ This method returns the statistics as a dictionary, which is handy for printing or saving them. """
+        return {'count': self._count, 'mean': self.get_mean(), 'stdev': self.get_stdev(),
+                'min': self._min, 'max': self._max}
+
+
+def random_layout(rng, num_atoms, size=10):
+    """ This function returns a list of num_atoms distinct atom positions placed anywhere inside the edges of a board
+    of the given size, picked with the random.Random instance rng. """
+    if isinstance(size, int):
+        size = (size, size)
+    inner_rows = size[0] - 2
+    inner_cols = size[1] - 2
+    cells = rng.sample(range(inner_rows * inner_cols), num_atoms)
+    return [(cell // inner_cols + 1, cell % inner_cols + 1) for cell in cells]
+
+
+def play_sweep(game, rng):
+    """ Strategy that shoots a ray from every entry point in order until all the atoms have been hit. """
+    for row, col in sorted(edge_positions(*game.get_size())):
+        if game.get_atoms_left() == 0:
+            return
+        game.shoot_ray(row, col)
+
+
+def play_random_shots(game, rng):
+    """ Strategy that shoots rays from random entry points (repeats allowed) until all the atoms have been hit or
+    twice as many rays as there are entry points have been shot. """
+    entries = sorted(edge_positions(*game.get_size()))
+    for _ in range(2 * len(entries)):
+        if game.get_atoms_left() == 0:
+            return
+        row, col = rng.choice(entries)
+        game.shoot_ray(row, col)
+
+
+def play_sweep_then_guess(game, rng):
+    """ Strategy that plays a sweep and then guesses as many random inside cells as there are atoms, to see how much
+    blind guessing costs. """
+    num_atoms = game.get_atoms_left()
+    play_sweep(game, rng)
+    rows, cols = game.get_size()
+    for _ in range(num_atoms):
+        game.guess_atom(rng.randint(1, rows - 2), rng.randint(1, cols - 2))
+
+
+# strategies are looked up by name so that only the name has to be sent to the worker processes.
+STRATEGIES = {
+    'sweep': play_sweep,
+    'random_shots': play_random_shots,
+    'sweep_then_guess': play_sweep_then_guess,
+}
+
+
+def simulate_chunk(seed, chunk_index, num_games, num_atoms, size, strategy):
+    """ This function plays num_games games with the named strategy and returns a dictionary of RunningStats for the
+    final score and the atoms left. Every chunk gets its own random generator seeded from (seed, chunk_index), so the
+    results are the same no matter which process runs the chunk or how many processes there are. """
+    rng = random.Random('%d:%d' % (seed, chunk_index))  # a distinct seed for every pair, however many chunks.
+    play = STRATEGIES[strategy]
+    stats = {'score': RunningStats(), 'atoms_left': RunningStats()}
+    for _ in range(num_games):
+        game = BlackBoxGame(random_layout(rng, num_atoms, size), size=size)
+        play(game, rng)
+        stats['score'].add(game.get_score())
+        stats['atoms_left'].add(game.get_atoms_left())
+    return stats
+
+
+def run_simulation(num_games, num_atoms=4, size=10, strategy='sweep', workers=None, chunk_size=1000, seed=0):
+    """ This function simulates num_games games and returns a dictionary of RunningStats for the final score and the
+    atoms left. The games are split into chunks of chunk_size and run on a pool of worker processes (one per CPU by
+    default, or in this process if workers is 1). Only a few chunks per worker are in flight at any time, so memory
+    does not grow with the number of games. Chunks are merged in order, so the results do not depend on the number
+    of workers. """
+    if strategy not in STRATEGIES:
+        raise ValueError('unknown strategy: ' + strategy)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    # the chunks are generated as they are needed rather than all up front.
+    chunks = ((seed, chunk_index, min(chunk_size, num_games - start), num_atoms, size, strategy)
+              for chunk_index, start in enumerate(range(0, num_games, chunk_size)))
+
+    totals = {'score': RunningStats(), 'atoms_left': RunningStats()}
+    if workers == 1:
+        for chunk in chunks:
+            _merge_stats(totals, simulate_chunk(*chunk))
+        return totals
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = {}  # maps a running future to the index of its chunk.
+        finished = {}  # results of chunks that finished before an earlier chunk, by chunk index.
+        next_index = 0  # index of the next chunk to merge.
+        chunk = next(chunks, None)
+        while chunk is not None or pending:
+            # keep the pool busy without queueing up every chunk at once. Results waiting to be merged count too.
+            while chunk is not None and len(pending) + len(finished) < 4 * workers:
+                pending[executor.submit(simulate_chunk, *chunk)] = chunk[1]
+                chunk = next(chunks, None)
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                finished[pending.pop(future)] = future.result()
+            # floating point sums depend on their order, so chunks are always merged in the order of their index.
+            while next_index in finished:
+                _merge_stats(totals, finished.pop(next_index))
+                next_index += 1
+    return totals
+
+
+def _merge_stats(totals, stats):
+    """ Helper function that merges the RunningStats of one chunk into the running totals. """
+    for name, running in stats.items():
+        totals[name].merge(running)
+
+
+def main():
+    """ Command line entry point that runs a simulation and prints the statistics. """
+    parser = argparse.ArgumentParser(description='Simulate random Black Box games.')
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument('--atoms', type=int, default=4)
+    parser.add_argument('--size', type=int, default=10)
+    parser.add_argument('--strategy', choices=sorted(STRATEGIES), default='sweep')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    totals = run_simulation(args.games, args.atoms, args.size, args.strategy, args.workers, args.chunk_size,
+                            args.seed)
+    for name, running in totals.items():
+        print(name, running.to_dict())
+
+
+if __name__ == '__main__':
+    main()
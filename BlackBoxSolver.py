@@ -0,0 +1,287 @@
+# Description: Solver that works out which atom layouts are still possible given the rays that have been shot so far.
+# Instead of trying every layout, the solver keeps a short list of partial layouts (cells known to hold an atom, cells
+# known to be empty, and everything else still open) and splits them only on the cells a ray actually looks at, using
+# the same hit, deflection and reflection rules as the move_ray_(left, right, up, down) methods of BlackBoxGame.
+
+import math
+
+from BlackBoxGame import edge_positions
+
+_PENDING = object()  # result of a _TraceNode that has not been worked out yet.
+
+
+class _TraceNode:
+    """ One node of the decision tree of a ray. Each node knows what the ray's path depends on once the cells in
+    assignments have been decided: either the next cell it needs to look at, or the final result of the ray. The tree
+    is filled in lazily and shared by every partial layout and every observation of the same entry point. """
+
+    __slots__ = ('assignments', 'state', 'cell', 'bit', 'result', 'children')
+
+    def __init__(self, assignments, state):
+        """ Init method that creates a node that has not been worked out yet. """
+        self.assignments = assignments  # maps each decided cell to True (atom) or False (empty).
+        self.state = state  # (row, col, row step, column step, first move) of the ray where it last stopped.
+        self.cell = None  # the undecided cell the ray looks at next, or None once the result is known.
+        self.bit = 0  # bit of cell in the solver's cell bitmasks.
+        self.result = _PENDING  # what shoot_ray returns for the ray, once cell is None.
+        self.children = None  # maps True/False for cell to the next node.
+
+    def child(self, has_atom):
+        """ This method returns the node reached when this node's cell is decided, creating it if needed. """
+        if self.children is None:
+            self.children = {}
+        node = self.children.get(has_atom)
+        if node is None:
+            assignments = dict(self.assignments)
+            assignments[self.cell] = has_atom
+            node = _TraceNode(assignments, self.state)  # the ray picks up where this node stopped.
+            self.children[has_atom] = node
+        return node
+
+
+class BlackBoxSolver:
+    """ This class keeps track of every atom layout that agrees with the rays and guesses seen so far. The layouts are
+    stored as partial layouts: a set of cells that must hold an atom, a set of cells that must be empty, and any
+    placement of the remaining atoms on the remaining cells. Both sets are kept as integer bitmasks with one bit per
+    inside cell. Each new observation splits and prunes these partial layouts in place, so nothing is recomputed from
+    scratch. """
+
+    def __init__(self, num_atoms, size=10):
+        """ Init method that starts the solver with every layout of num_atoms atoms on a board of the given size
+        still possible. The size works the same way as it does for BlackBoxGame. """
+        if isinstance(size, int):
+            size = (size, size)
+        self._rows, self._cols = size
+        self._num_atoms = num_atoms
+        self._cells = frozenset((row, col) for row in range(1, self._rows - 1) for col in range(1, self._cols - 1))
+        self._cell_list = sorted(self._cells)  # cell i is represented by bit 1 << i in the bitmasks.
+        self._bits = {cell: 1 << index for index, cell in enumerate(self._cell_list)}
+        self._entries = edge_positions(self._rows, self._cols)
+        self._layouts = [(0, 0)]  # partial layouts as (atom cells, empty cells) bitmasks.
+        self._observations = []
+        self._trace_roots = {}  # maps each entry point to the root of its decision tree.
+        self._summary = None  # cached (must contain, cannot contain, layout count) until the next observation.
+
+    def get_observations(self):
+        """ This method returns the list of (kind, row, col, result) observations made so far. """
+        return list(self._observations)
+
+    def observe_ray(self, row, col, result):
+        """ This method records the result of shoot_ray(row, col), which is None for a hit or the exit position, and
+        removes every layout that would have given a different result. Returns False if the entry is not valid. """
+        entry = (row, col)
+        if entry not in self._entries or result is False:
+            return False
+        root = self._trace_roots.get(entry)
+        if root is None:
+            root = _TraceNode({}, self._start_state(entry))
+            self._trace_roots[entry] = root
+        self._layouts = self._refine(root, result)
+        self._observations.append(('ray', row, col, result))
+        self._summary = None
+        return True
+
+    def observe_guess(self, row, col, correct):
+        """ This method records the result of guess_atom(row, col) and removes every layout that disagrees with it. """
+        bit = self._bits.get((row, col), 0)
+        num_cells = len(self._cells)
+        layouts = []
+        for atoms, empties in self._layouts:
+            if atoms & bit:
+                if correct:
+                    layouts.append((atoms, empties))
+            elif empties & bit or bit == 0:
+                if not correct:
+                    layouts.append((atoms, empties))
+            elif correct:
+                if atoms.bit_count() < self._num_atoms:
+                    layouts.append((atoms | bit, empties))
+            elif self._num_atoms - atoms.bit_count() <= num_cells - atoms.bit_count() - empties.bit_count() - 1:
+                layouts.append((atoms, empties | bit))
+        self._layouts = layouts
+        self._observations.append(('guess', row, col, correct))
+        self._summary = None
+
+    def count_layouts(self):
+        """ This method returns how many full atom layouts are still possible. """
+        return self._summarize()[2]
+
+    def must_contain(self):
+        """ This method returns the set of cells that hold an atom in every layout that is still possible. """
+        return self._summarize()[0]
+
+    def cannot_contain(self):
+        """ This method returns the set of cells that are empty in every layout that is still possible. """
+        return self._summarize()[1]
+
+    def atom_probabilities(self):
+        """ This method returns a dictionary that maps every inside cell to the fraction of the possible layouts that
+        have an atom there. Returns an empty dictionary if no layout is possible. """
+        num_cells = len(self._cells)
+        all_cells = (1 << num_cells) - 1
+        total = 0
+        weights = [0] * num_cells
+        for atoms, empties in self._layouts:
+            open_cells = all_cells & ~(atoms | empties)
+            num_open = open_cells.bit_count()
+            atoms_left = self._num_atoms - atoms.bit_count()
+            count = math.comb(num_open, atoms_left)
+            total += count
+            # each open cell holds an atom in atoms_left / num_open of this partial layout's placements.
+            share = count * atoms_left / num_open if atoms_left > 0 else 0
+            for index in range(num_cells):
+                bit = 1 << index
+                if atoms & bit:
+                    weights[index] += count
+                elif open_cells & bit:
+                    weights[index] += share
+        if total == 0:
+            return {}
+        return {cell: weights[index] / total for index, cell in enumerate(self._cell_list)}
+
+    def sample_layouts(self, rng, count):
+        """ This method returns a list of count atom layouts picked at random (with repeats) from the layouts that are
+        still possible, each one equally likely, using the random.Random instance rng. Returns an empty list if no
+        layout is possible. """
+        all_cells = (1 << len(self._cells)) - 1
+        weights = []
+        for atoms, empties in self._layouts:
+            num_open = (all_cells & ~(atoms | empties)).bit_count()
+            weights.append(math.comb(num_open, self._num_atoms - atoms.bit_count()))
+        if not self._layouts or sum(weights) == 0:
+            return []
+        layouts = []
+        for atoms, empties in rng.choices(self._layouts, weights, k=count):
+            open_cells = [cell for index, cell in enumerate(self._cell_list)
+                          if not (atoms | empties) >> index & 1]
+            placed = rng.sample(open_cells, self._num_atoms - atoms.bit_count())
+            layouts.append(sorted(self._to_cells(atoms)) + placed)
+        return layouts
+
+    def get_partial_layouts(self):
+        """ This method returns the current list of partial layouts as (atom cells, empty cells) pairs of sets. """
+        return [(self._to_cells(atoms), self._to_cells(empties)) for atoms, empties in self._layouts]
+
+    def _to_cells(self, mask):
+        """ Helper method that turns a cell bitmask into a frozenset of (row, col) cells. """
+        return frozenset(cell for index, cell in enumerate(self._cell_list) if mask >> index & 1)
+
+    def _summarize(self):
+        """ Helper method that works out and caches the must/cannot contain sets and the layout count. """
+        if self._summary is not None:
+            return self._summary
+        all_cells = (1 << len(self._cells)) - 1
+        must = all_cells
+        cannot = all_cells
+        total = 0
+        for atoms, empties in self._layouts:
+            open_cells = all_cells & ~(atoms | empties)
+            num_open = open_cells.bit_count()
+            atoms_left = self._num_atoms - atoms.bit_count()
+            total += math.comb(num_open, atoms_left)
+            must &= atoms | open_cells if atoms_left == num_open else atoms
+            cannot &= empties | open_cells if atoms_left == 0 else empties
+        if not self._layouts:  # nothing is possible any more, so there is nothing to report.
+            must = 0
+            cannot = 0
+        self._summary = (self._to_cells(must), self._to_cells(cannot), total)
+        return self._summary
+
+    def _refine(self, root, result):
+        """ Helper method that walks every partial layout down the decision tree of a ray starting at root, splitting
+        them on every open cell the ray looks at, and returns the pieces whose result matches. Partial layouts that
+        reach the same node are moved along together. """
+        num_atoms = self._num_atoms
+        num_cells = len(self._cells)
+        matches = []
+        stack = [(root, self._layouts)]
+        while stack:
+            node, layouts = stack.pop()
+            if node.cell is None and node.result is _PENDING:
+                self._expand(node)
+            if node.cell is None:
+                if node.result == result:
+                    matches.extend(layouts)
+                continue
+            bit = node.bit
+            with_atom = []
+            without_atom = []
+            for atoms, empties in layouts:
+                if atoms & bit:
+                    with_atom.append((atoms, empties))
+                elif empties & bit:
+                    without_atom.append((atoms, empties))
+                else:
+                    placed = atoms.bit_count()
+                    if placed < num_atoms:
+                        with_atom.append((atoms | bit, empties))
+                    # the cell can only be empty if the atoms still fit in the other open cells.
+                    if num_atoms - placed <= num_cells - placed - empties.bit_count() - 1:
+                        without_atom.append((atoms, empties | bit))
+            if with_atom:
+                stack.append((node.child(True), with_atom))
+            if without_atom:
+                stack.append((node.child(False), without_atom))
+        return matches
+
+    def _start_state(self, entry):
+        """ Helper method that returns the starting ray state for entry, with the same directions as set_direction. """
+        row, col = entry
+        if row == 0:
+            return row, col, 1, 0, True
+        elif row == self._rows - 1:
+            return row, col, -1, 0, True
+        elif col == 0:
+            return row, col, 0, 1, True
+        return row, col, 0, -1, True
+
+    def _expand(self, node):
+        """ Helper method that moves the ray on from where node's parent stopped, using only the cells decided in
+        node.assignments. It stops at the first undecided cell the ray needs to look at, or stores the result of the
+        ray if it gets that far. """
+        assignments = node.assignments
+        row, col, d_row, d_col, first_move = node.state
+        while first_move or (row, col) not in self._entries:
+            front = (row + d_row, col + d_col)
+            # (d_col, d_row) is at a right angle to the direction of the ray, so these are the two diagonal cells.
+            side_a = (front[0] + d_col, front[1] + d_row)
+            side_b = (front[0] - d_col, front[1] - d_row)
+            has_front = self._decided(front, assignments)
+            if has_front is None:
+                self._stop_at(node, front, (row, col, d_row, d_col, first_move))
+                return
+            if has_front:
+                node.result = None  # hit, the diagonal cells do not matter.
+                return
+            has_a = self._decided(side_a, assignments)
+            if has_a is None:
+                self._stop_at(node, side_a, (row, col, d_row, d_col, first_move))
+                return
+            has_b = self._decided(side_b, assignments)
+            if has_b is None:
+                self._stop_at(node, side_b, (row, col, d_row, d_col, first_move))
+                return
+            first_move = False
+            if has_a and has_b:
+                d_row, d_col = -d_row, -d_col
+            elif has_a:
+                d_row, d_col = -d_col, -d_row
+            elif has_b:
+                d_row, d_col = d_col, d_row
+            else:
+                row, col = front
+        node.result = (row, col)
+
+    def _decided(self, cell, assignments):
+        """ Helper method that returns True or False if it is decided whether cell holds an atom, or None if not.
+        Cells outside the edges never hold an atom. """
+        if cell not in self._cells:
+            return False
+        return assignments.get(cell)
+
+    def _stop_at(self, node, cell, state):
+        """ Helper method that marks cell as the undecided cell the ray of node looks at next, and saves the state of
+        the ray so the children of node can carry on from there. """
+        node.cell = cell
+        node.bit = self._bits[cell]
+        node.state = state
@@ -0,0 +1,178 @@
+# Description: Thread-safe store of Black Box games shared by many worker threads, along with a contention benchmark.
+# Games are spread over a fixed number of lock stripes, and every shoot_ray or guess_atom runs while holding the lock
+# of its game's stripe, so the read-modify-write of the score can never be interleaved. After each change the store
+# publishes a new (score, atoms left) tuple for the game, which readers pick up without taking any lock. The tuple is
+# never changed once published, so a reader always sees a score and atom count that belong together.
+#
+# python BlackBoxStore.py --threads 1 2 4 8 16 32 64
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+
+from BlackBoxGame import BlackBoxGame, edge_positions
+
+
+class _Entry:
+    """ One stored game along with the (score, atoms left) view published after its last change. """
+
+    __slots__ = ('game', 'view')
+
+    def __init__(self, game):
+        """ Init method that wraps the game and publishes its starting view. """
+        self.game = game
+        self.view = (game.get_score(), game.get_atoms_left())
+
+
+class BlackBoxStore:
+    """ This class holds games by id for use by many threads at once. shoot_ray and guess_atom on the same game run
+    one at a time, while games on different stripes never wait for each other. get_score, get_atoms_left and get_view
+    never take a lock. """
+
+    def __init__(self, stripes=64):
+        """ Init method that creates an empty store with the given number of lock stripes. More stripes means less
+        chance of two busy games sharing a lock. """
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._entries = {}  # maps a game id to its _Entry.
+        self._id_lock = threading.Lock()  # guards _next_id.
+        self._next_id = 1
+
+    def _lock_for(self, game_id):
+        """ Helper method that returns the lock of the stripe game_id belongs to. """
+        return self._locks[game_id % len(self._locks)]
+
+    def add_game(self, atom_list, precompute=True, size=10):
+        """ This method creates a game with the given atoms, stores it and returns its id. Ray outcomes are
+        precomputed by default, so the time a shot holds the lock for is only a lookup and the scoring. The game is
+        built before any lock is taken. """
+        entry = _Entry(BlackBoxGame(atom_list, precompute, size))
+        with self._id_lock:
+            game_id = self._next_id
+            self._next_id += 1
+        with self._lock_for(game_id):
+            self._entries[game_id] = entry
+        return game_id
+
+    def remove_game(self, game_id):
+        """ This method removes a game from the store. Raises KeyError if there is no such game. """
+        with self._lock_for(game_id):
+            del self._entries[game_id]
+
+    def get_game_count(self):
+        """ This method returns how many games are stored. """
+        return len(self._entries)
+
+    def shoot_ray(self, game_id, row, col):
+        """ This method calls shoot_ray on the game with the given id while holding its stripe lock, publishes the
+        new view and returns what shoot_ray returned. """
+        with self._lock_for(game_id):
+            entry = self._entries[game_id]
+            result = entry.game.shoot_ray(row, col)
+            entry.view = (entry.game.get_score(), entry.game.get_atoms_left())
+        return result
+
+    def guess_atom(self, game_id, row, col):
+        """ This method calls guess_atom on the game with the given id while holding its stripe lock, publishes the
+        new view and returns what guess_atom returned. """
+        with self._lock_for(game_id):
+            entry = self._entries[game_id]
+            result = entry.game.guess_atom(row, col)
+            entry.view = (entry.game.get_score(), entry.game.get_atoms_left())
+        return result
+
+    def get_view(self, game_id):
+        """ This method returns the (score, atoms left) of the game as of its last finished change, without taking a
+        lock. """
+        return self._entries[game_id].view
+
+    def get_score(self, game_id):
+        """ This method returns the score of the game as of its last finished change, without taking a lock. """
+        return self._entries[game_id].view[0]
+
+    def get_atoms_left(self, game_id):
+        """ This method returns how many atoms the game has left as of its last finished change, without taking a
+        lock. """
+        return self._entries[game_id].view[1]
+
+
+def run_contention(threads, games=64, operations=200000, read_fraction=0.5, stripes=64, seed=0):
+    """ This function has threads worker threads make operations calls in total on a store of games random games,
+    where read_fraction of the calls are get_view and the rest are shoot_ray or guess_atom. It returns a dictionary
+    with the number of operations, the operations per second and the p50/p99 latency in microseconds. """
+    rng = random.Random(seed)
+    cells = [(row, col) for row in range(1, 9) for col in range(1, 9)]
+    entries = sorted(edge_positions(10, 10))
+    store = BlackBoxStore(stripes)
+    game_ids = [store.add_game(rng.sample(cells, 4)) for _ in range(games)]
+    latencies = [[] for _ in range(threads)]
+    start_line = threading.Barrier(threads + 1)
+
+    def worker(index):
+        worker_rng = random.Random(rng.random())
+        times = latencies[index]
+        start_line.wait()
+        for _ in range(operations // threads):
+            game_id = worker_rng.choice(game_ids)
+            roll = worker_rng.random()
+            start = time.perf_counter()
+            if roll < read_fraction:
+                store.get_view(game_id)
+            elif roll < read_fraction + (1 - read_fraction) * 0.9:
+                store.shoot_ray(game_id, *worker_rng.choice(entries))
+            else:
+                store.guess_atom(game_id, *worker_rng.choice(cells))
+            times.append(time.perf_counter() - start)
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    for thread in workers:
+        thread.start()
+    start_line.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    all_latencies = sorted(latency for times in latencies for latency in times)
+    return {
+        'threads': threads,
+        'operations': len(all_latencies),
+        'operations_per_second': len(all_latencies) / elapsed,
+        'p50_us': _percentile(all_latencies, 50) * 1e6,
+        'p99_us': _percentile(all_latencies, 99) * 1e6,
+    }
+
+
+def _percentile(sorted_values, percent):
+    """ Helper function that returns the given percentile of an already sorted list (0 for an empty list). """
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * percent / 100))
+    return sorted_values[index]
+
+
+def main():
+    """ Command line entry point that runs the contention benchmark at each thread count and prints the results as
+    JSON. The report says whether the GIL was enabled, so runs on free-threaded CPython builds (3.13t and later) can
+    be told apart from regular ones. """
+    parser = argparse.ArgumentParser(description='Benchmark BlackBoxStore with many threads.')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument('--games', type=int, default=64)
+    parser.add_argument('--operations', type=int, default=200000)
+    parser.add_argument('--read-fraction', type=float, default=0.5)
+    parser.add_argument('--stripes', type=int, default=64)
+    args = parser.parse_args()
+    # sys._is_gil_enabled only exists from 3.13 on, and older builds always have the GIL.
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', lambda: True)
+    report = {
+        'python': sys.version.split()[0],
+        'gil_enabled': is_gil_enabled(),
+        'results': [run_contention(threads, args.games, args.operations, args.read_fraction, args.stripes)
+                    for threads in args.threads],
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+# Description: Offline tool that works out which atom layouts can be told apart by shooting rays. Every placement of k
+# atoms on the inside of a 10x10 board is enumerated and given a signature made of what shoot_ray returns from each of
+# the 32 entry points, and layouts with the same signature cannot be told apart. Layouts are enumerated depth first so
+# that each one starts from the rays of the layout it extends: adding an atom only changes the rays that looked at its
+# cell on the way through. The work is spread over a process pool, signatures are written to bucket files on disk
+# picked by their hash, and the buckets are grouped one at a time so memory stays small for millions of layouts.
+#
+# python BlackBoxUniqueness.py 4 results/
+
+import argparse
+import concurrent.futures
+import json
+import os
+import zlib
+
+from BlackBoxGame import edge_positions
+
+SIZE = 10
+ENTRIES = sorted(edge_positions(SIZE, SIZE))  # entry points, in the order they appear in a signature.
+CELLS = [(row, col) for row in range(1, SIZE - 1) for col in range(1, SIZE - 1)]  # cells atoms can be placed on.
+BUCKETS = 256  # number of bucket files the signatures are spread over.
+
+# a ray's position is kept as a board index (row * SIZE + col) and it moves by adding a step to it.
+_CELL_INDEX = [row * SIZE + col for row, col in CELLS]
+_EXIT_CODE = [0] * (SIZE * SIZE)  # 1 + the place in ENTRIES of every entry point by board index, 0 everywhere else.
+for _place, (_row, _col) in enumerate(ENTRIES):
+    _EXIT_CODE[_row * SIZE + _col] = _place + 1
+# a step at a right angle to each step, used to find the two cells diagonally ahead of a ray.
+_SIDE = {SIZE: 1, -SIZE: 1, 1: SIZE, -1: SIZE}
+
+
+def _start(entry):
+    """ Helper function that returns the (board index, step) of a ray shot from entry, like set_direction. """
+    row, col = entry
+    if row == 0:
+        step = SIZE  # down
+    elif row == SIZE - 1:
+        step = -SIZE  # up
+    elif col == 0:
+        step = 1  # right
+    else:
+        step = -1  # left
+    return row * SIZE + col, step
+
+
+_STARTS = [_start(entry) for entry in ENTRIES]
+
+
+def trace(occupied, entry, looked_at=None):
+    """ This function shoots a ray from ENTRIES[entry] into the layout given by the bitmask occupied (bit i is set if
+    there is an atom on board index i) and returns 0 for a hit, or 1 + the place in ENTRIES of the point the ray left
+    through. If a set is passed as looked_at, the board index of every cell the ray checked for an atom is added to
+    it: those are the only cells that can change where the ray goes. The ray follows the same rules as the
+    move_ray_(left, right, up, down) methods of BlackBoxGame. """
+    position, step = _STARTS[entry]
+    first_move = True
+    while first_move or not _EXIT_CODE[position]:
+        first_move = False
+        front = position + step
+        side = _SIDE[step]
+        if looked_at is not None:
+            looked_at.update((front, front + side, front - side))
+        if occupied >> front & 1:
+            return 0
+        if occupied >> (front + side) & 1:
+            if occupied >> (front - side) & 1:
+                step = -step  # double deflection, go back the way the ray came.
+            else:
+                step = -side  # turn away from the atom.
+        elif occupied >> (front - side) & 1:
+            step = side
+        else:
+            position = front
+    return _EXIT_CODE[position]
+
+
+def layout_signature(atoms):
+    """ This function returns the signature of a layout given as a list of (row, col) atoms: one byte per entry point
+    in ENTRIES order, 0 if the ray hits an atom and 1 + the place in ENTRIES of its exit point otherwise. Two layouts
+    give the same results for every shoot_ray exactly when their signatures are equal. """
+    occupied = 0
+    for row, col in atoms:
+        occupied |= 1 << (row * SIZE + col)
+    return bytes(trace(occupied, entry) for entry in range(len(ENTRIES)))
+
+
+def analyze_prefix(num_atoms, prefix):
+    """ This function works out the signature of every layout of num_atoms atoms whose lowest cells (as indexes into
+    CELLS) are the ones in prefix, and returns a list of BUCKETS byte strings. Each layout is added to the bucket
+    picked by the hash of its signature as a record of the signature followed by one byte per cell of the layout. """
+    buckets = [bytearray() for _ in range(BUCKETS)]
+    occupied = 0
+    for cell in prefix:
+        occupied |= 1 << _CELL_INDEX[cell]
+    outcomes = []
+    looked_at = []
+    for entry in range(len(ENTRIES)):
+        cells = set()
+        outcomes.append(trace(occupied, entry, cells))
+        looked_at.append(cells)
+    _extend(buckets, num_atoms - len(prefix), bytes(prefix), occupied, outcomes, looked_at)
+    return [bytes(bucket) for bucket in buckets]
+
+
+def _extend(buckets, remaining, layout, occupied, outcomes, looked_at):
+    """ Helper function that adds every way of placing remaining more atoms after the last cell of layout, whose
+    rays ended with outcomes after looking at the cells in looked_at. Only the rays that looked at the new atom's cell
+    are traced again, everything else is carried over from the smaller layout. """
+    if remaining == 0:
+        signature = bytes(outcomes)
+        buckets[zlib.crc32(signature) % BUCKETS] += signature + layout
+        return
+    affected = [[] for _ in range(SIZE * SIZE)]  # the rays that looked at each board index.
+    for entry, cells in enumerate(looked_at):
+        for index in cells:
+            affected[index].append(entry)
+    start = layout[-1] + 1 if layout else 0
+    for cell in range(start, len(CELLS) - remaining + 1):
+        index = _CELL_INDEX[cell]
+        new_occupied = occupied | 1 << index
+        new_outcomes = list(outcomes)
+        if remaining == 1:  # the last atom, so nothing will look at looked_at again.
+            for entry in affected[index]:
+                new_outcomes[entry] = trace(new_occupied, entry)
+            _extend(buckets, 0, layout + bytes((cell,)), new_occupied, new_outcomes, None)
+            continue
+        new_looked_at = list(looked_at)
+        for entry in affected[index]:
+            cells = set()
+            new_outcomes[entry] = trace(new_occupied, entry, cells)
+            new_looked_at[entry] = cells
+        _extend(buckets, remaining - 1, layout + bytes((cell,)), new_occupied, new_outcomes, new_looked_at)
+
+
+def _prefixes(num_atoms):
+    """ Helper function that splits the layouts of num_atoms atoms into tasks by their lowest one or two cells, with
+    the largest tasks first. """
+    if num_atoms == 1:
+        return [(cell,) for cell in range(len(CELLS))]
+    last = len(CELLS) - num_atoms + 2  # the second cell must leave room for the other atoms after it.
+    return [(first, second) for first in range(last - 1) for second in range(first + 1, last)]
+
+
+def analyze(num_atoms, output_dir, workers=None):
+    """ This function finds the signature of every layout of num_atoms atoms and writes the results to output_dir:
+    unique.txt lists every layout that no other layout shares its signature with, ambiguous.txt lists every group of
+    two or more layouts that cannot be told apart (one group per line, layouts separated by " | "), and summary.json
+    holds the counts, which are also returned as a dictionary. Layouts are written as space separated row,col cells.
+    The layouts are split by their lowest cells over a pool of worker processes (one per CPU by default, or this
+    process if workers is 1). """
+    if not 1 <= num_atoms <= len(CELLS):
+        raise ValueError('num_atoms must be between 1 and %d' % len(CELLS))
+    if workers is None:
+        workers = os.cpu_count() or 1
+    bucket_dir = os.path.join(output_dir, 'buckets')
+    os.makedirs(bucket_dir, exist_ok=True)
+    bucket_paths = [os.path.join(bucket_dir, '%03d.bin' % bucket) for bucket in range(BUCKETS)]
+
+    bucket_files = [open(path, 'wb') for path in bucket_paths]
+    try:
+        for buckets in _map_prefixes(num_atoms, workers):
+            for bucket_file, records in zip(bucket_files, buckets):
+                bucket_file.write(records)
+    finally:
+        for bucket_file in bucket_files:
+            bucket_file.close()
+
+    summary = {'atoms': num_atoms, 'layouts': 0, 'signatures': 0, 'unique': 0, 'largest_group': 0}
+    record_size = len(ENTRIES) + num_atoms
+    with open(os.path.join(output_dir, 'unique.txt'), 'w') as unique_file, \
+            open(os.path.join(output_dir, 'ambiguous.txt'), 'w') as ambiguous_file:
+        for path in bucket_paths:
+            with open(path, 'rb') as bucket_file:
+                data = bucket_file.read()
+            os.remove(path)
+            groups = {}
+            for offset in range(0, len(data), record_size):
+                record = data[offset:offset + record_size]
+                groups.setdefault(record[:len(ENTRIES)], []).append(record[len(ENTRIES):])
+            summary['layouts'] += len(data) // record_size
+            summary['signatures'] += len(groups)
+            for layouts in groups.values():
+                if len(layouts) == 1:
+                    summary['unique'] += 1
+                    unique_file.write(_format_layout(layouts[0]) + '\n')
+                else:
+                    summary['largest_group'] = max(summary['largest_group'], len(layouts))
+                    ambiguous_file.write(' | '.join(_format_layout(layout) for layout in layouts) + '\n')
+    os.rmdir(bucket_dir)
+    with open(os.path.join(output_dir, 'summary.json'), 'w') as summary_file:
+        json.dump(summary, summary_file, indent=2)
+        summary_file.write('\n')
+    return summary
+
+
+def _map_prefixes(num_atoms, workers):
+    """ Helper function that yields the buckets of every task, running them on a process pool unless workers is 1.
+    Only a few tasks per worker are in flight at once so that finished buckets do not pile up in memory. """
+    prefixes = iter(_prefixes(num_atoms))
+    if workers == 1:
+        for prefix in prefixes:
+            yield analyze_prefix(num_atoms, prefix)
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        prefix = next(prefixes, None)
+        while prefix is not None or pending:
+            while prefix is not None and len(pending) < 4 * workers:
+                pending.add(executor.submit(analyze_prefix, num_atoms, prefix))
+                prefix = next(prefixes, None)
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def _format_layout(layout):
+    """ Helper function that turns a layout of CELLS indexes into text like "1,2 3,4". """
+    return ' '.join('%d,%d' % CELLS[cell] for cell in layout)
+
+
+def main():
+    """ Command line entry point that analyzes every layout with the given number of atoms and prints the summary. """
+    parser = argparse.ArgumentParser(description='Find the Black Box layouts that rays can tell apart.')
+    parser.add_argument('atoms', type=int, help='number of atoms in each layout')
+    parser.add_argument('output_dir', help='directory to write the results to')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    print(json.dumps(analyze(args.atoms, args.output_dir, args.workers), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+# Description: Command line front end for the Black Box game, run as "python -m blackbox". It has two commands:
+#
+# python -m blackbox play [--atoms 3,2 1,7 4,6] [--random 4] [--seed 1] [--size 10]
+#     plays a game in the terminal, with the board drawn after every move.
+# python -m blackbox score layouts.txt shots.txt
+#     scores recorded games. Line n of layouts.txt holds the atoms of game n as row,col pairs separated by spaces,
+#     and line n of shots.txt holds its moves in order: sROW,COL shoots a ray and gROW,COL guesses an atom. For every
+#     game a line with the final score and the number of atoms left is printed.
+#
+# Both files are read one line at a time, so they can be any size. This file is used by short-lived jobs, so it only
+# imports BlackBoxGame up front (no argparse) and anything else only when a command needs it.
+
+import itertools
+import sys
+
+from BlackBoxGame import BlackBoxGame
+
+USAGE = '''usage: python -m blackbox play [--atoms ROW,COL ...] [--random COUNT] [--seed SEED] [--size SIZE]
+       python -m blackbox score LAYOUTS SHOTS'''
+
+HELP = '''commands:
+  s ROW COL   shoot a ray from an edge position
+  g ROW COL   guess that there is an atom at ROW, COL
+  reveal      show where the atoms are and end the game
+  q           quit'''
+
+
+def parse_cell(text):
+    """ This function turns text like "3,2" into the (row, col) tuple (3, 2). Raises ValueError if the text is not
+    two whole numbers separated by a comma. """
+    row, col = text.split(',')
+    return int(row), int(col)
+
+
+def render(game, atoms, reveal=False):
+    """ This function returns the board of game as text, one character per cell, built from the state in its snapshot
+    and atoms, the set of its atom positions. '#' is a corner, 'o' an edge position a ray has been shot from or came
+    out of, '*' an atom that has been hit, '@' a correct guess and 'x' a wrong one. If reveal is True, the other atoms
+    are shown as 'A'. """
+    _, used, guesses, hit = game.snapshot()
+    rows, cols = game.get_size()
+    lines = ['   ' + ''.join(str(col % 10) for col in range(cols))]
+    for row in range(rows):
+        line = []
+        for col in range(cols):
+            position = (row, col)
+            on_row_edge = row == 0 or row == rows - 1
+            on_col_edge = col == 0 or col == cols - 1
+            if on_row_edge and on_col_edge:
+                line.append('#')
+            elif on_row_edge or on_col_edge:
+                line.append('o' if used & game.edge_bit(position) else '.')
+            elif hit & game.atom_bit(position):
+                line.append('*')
+            elif position in guesses:
+                line.append('@' if position in atoms else 'x')
+            elif reveal and position in atoms:
+                line.append('A')
+            else:
+                line.append(' ')
+        lines.append('%2d %s' % (row, ''.join(line)))
+    return '\n'.join(lines)
+
+
+def play(atom_list, size=10):
+    """ This function plays a game with the given atoms in the terminal, reading commands from standard input until
+    every atom has been hit, the board is revealed or the player quits. Returns the final score. """
+    game = BlackBoxGame(atom_list, size=size)
+    atoms = frozenset(atom_list)
+    print(HELP)
+    print(render(game, atoms))
+    while game.get_atoms_left() > 0:
+        try:
+            words = input('score %g, atoms left %d> ' % (game.get_score(), game.get_atoms_left())).split()
+        except EOFError:
+            break
+        if not words:
+            continue
+        command = words[0]
+        if command in ('q', 'quit'):
+            break
+        if command == 'reveal':
+            print(render(game, atoms, True))
+            return game.get_score()
+        try:
+            row, col = int(words[1]), int(words[2])
+        except (IndexError, ValueError):
+            print(HELP)
+            continue
+        if command == 's':
+            result = game.shoot_ray(row, col)
+            if result is False:
+                print('(%d, %d) is not a valid entry point' % (row, col))
+            elif result is None:
+                print('hit')
+            else:
+                print('the ray came out at (%d, %d)' % result)
+        elif command == 'g':
+            print('correct' if game.guess_atom(row, col) else 'wrong')
+        else:
+            print(HELP)
+            continue
+        print(render(game, atoms))
+    if game.get_atoms_left() == 0:
+        print('every atom has been hit, final score %g' % game.get_score())
+        print(render(game, atoms, True))
+    return game.get_score()
+
+
+def score(layouts_path, shots_path, output=sys.stdout):
+    """ This function plays the games in layouts_path with the moves in shots_path (see the top of this file for the
+    format) and writes "SCORE ATOMS_LEFT" for each game to output. Raises ValueError for a badly formed line or if
+    the files do not have the same number of lines. """
+    with open(layouts_path) as layouts_file, open(shots_path) as shots_file:
+        lines = itertools.zip_longest(layouts_file, shots_file)  # pads the shorter file with None.
+        for line_number, (layout_line, shots_line) in enumerate(lines, 1):
+            if layout_line is None or shots_line is None:
+                raise ValueError('%s and %s do not have the same number of lines (stopped after %d)'
+                                 % (layouts_path, shots_path, line_number - 1))
+            try:
+                game = BlackBoxGame([parse_cell(cell) for cell in layout_line.split()])
+                for move in shots_line.split():
+                    row, col = parse_cell(move[1:])
+                    if move[0] == 's':
+                        game.shoot_ray(row, col)
+                    elif move[0] == 'g':
+                        game.guess_atom(row, col)
+                    else:
+                        raise ValueError('unknown move %r' % move)
+            except ValueError as error:
+                raise ValueError('line %d: %s' % (line_number, error))
+            output.write('%g %d\n' % (game.get_score(), game.get_atoms_left()))
+
+
+def main(argv=None):
+    """ Command line entry point. Returns the exit status: 0 on success, 1 if the input files are bad and 2 for a
+    bad command line. """
+    args = sys.argv[1:] if argv is None else argv
+    if len(args) == 3 and args[0] == 'score':
+        try:
+            score(args[1], args[2])
+        except (OSError, ValueError) as error:
+            print('blackbox: %s' % error, file=sys.stderr)
+            return 1
+        return 0
+    if args and args[0] == 'play':
+        options = {'--atoms': [], '--random': ['4'], '--seed': [None], '--size': ['10']}
+        option = None
+        try:
+            for arg in args[1:]:
+                if arg.startswith('--'):
+                    if arg not in options:
+                        raise ValueError(arg)
+                    option = arg
+                    options[option] = []
+                elif option is None:
+                    raise ValueError(arg)
+                else:
+                    options[option].append(arg)
+            size = int(options['--size'][0])
+            atom_list = [parse_cell(cell) for cell in options['--atoms']]
+            if not atom_list:
+                import random  # only needed for a random layout.
+                seed = options['--seed'][0]
+                cells = [(row, col) for row in range(1, size - 1) for col in range(1, size - 1)]
+                atom_list = random.Random(seed).sample(cells, int(options['--random'][0]))
+        except (IndexError, ValueError):
+            print(USAGE, file=sys.stderr)
+            return 2
+        play(atom_list, size)
+        return 0
+    print(USAGE, file=sys.stderr)
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,50 @@
+# Description: Checks that BlackBoxBatch.shoot_rays gives the same results as BlackBoxGame.shoot_ray for every entry
+# point (and a few invalid ones) of random layouts on square and rectangular boards. Skipped if NumPy is not installed.
+
+import random
+import unittest
+
+from BlackBoxGame import BlackBoxGame, edge_positions
+
+try:
+    from BlackBoxBatch import EXIT, HIT, INVALID, REFLECTION, occupancy_from_atoms, shoot_rays
+except ImportError:  # NumPy is only needed for the batch scorer.
+    shoot_rays = None
+
+
+@unittest.skipIf(shoot_rays is None, 'NumPy is not installed')
+class TestShootRays(unittest.TestCase):
+
+    def test_matches_shoot_ray(self):
+        rng = random.Random(3)
+        for rows, cols in [(10, 10), (7, 15), (12, 5)]:
+            cells = [(row, col) for row in range(1, rows - 1) for col in range(1, cols - 1)]
+            layouts = [rng.sample(cells, rng.randint(0, min(20, len(cells)))) for _ in range(40)]
+            entries = sorted(edge_positions(rows, cols)) + [(0, 0), (3, 3), (rows, 1), (-1, 2)]
+            entry_rows, entry_cols, games = [], [], []
+            for game_index in range(len(layouts)):
+                for row, col in entries:
+                    entry_rows.append(row)
+                    entry_cols.append(col)
+                    games.append(game_index)
+            outcomes = shoot_rays(occupancy_from_atoms(layouts, (rows, cols)), entry_rows, entry_cols, games)
+
+            index = 0
+            for atoms in layouts:
+                for entry in entries:
+                    result = BlackBoxGame(atoms, size=(rows, cols)).shoot_ray(*entry)
+                    kind, row, col = (int(value) for value in outcomes[index])
+                    if result is False:
+                        self.assertEqual(kind, INVALID)
+                    elif result is None:
+                        self.assertEqual(kind, HIT)
+                        self.assertIn((row, col), atoms)
+                    elif result == entry:
+                        self.assertEqual((kind, row, col), (REFLECTION,) + entry)
+                    else:
+                        self.assertEqual((kind, row, col), (EXIT,) + result)
+                    index += 1
+
+
+if __name__ == '__main__':
+    unittest.main()
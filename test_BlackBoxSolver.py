@@ -0,0 +1,63 @@
+# Description: Checks BlackBoxSolver against brute force on a 6x6 board: after random rays and guesses, the layouts it
+# counts, the cells it is sure about and its atom probabilities must match what trying every layout with BlackBoxGame
+# gives.
+
+import itertools
+import random
+import unittest
+
+from BlackBoxGame import BlackBoxGame, edge_positions
+from BlackBoxSolver import BlackBoxSolver
+
+SIZE = 6
+CELLS = [(row, col) for row in range(1, SIZE - 1) for col in range(1, SIZE - 1)]
+ENTRIES = sorted(edge_positions(SIZE, SIZE))
+
+
+def matching_layouts(num_atoms, observations):
+    """ This function returns every layout of num_atoms atoms (as a set) that gives the same result for every
+    (kind, position, result) observation, found by trying them all. """
+    layouts = []
+    for layout in itertools.combinations(CELLS, num_atoms):
+        game = BlackBoxGame(list(layout), size=SIZE)
+        for kind, (row, col), result in observations:
+            seen = game.shoot_ray(row, col) if kind == 'ray' else (row, col) in layout
+            if seen != result:
+                break
+        else:
+            layouts.append(set(layout))
+    return layouts
+
+
+class TestBlackBoxSolver(unittest.TestCase):
+
+    def test_matches_brute_force(self):
+        rng = random.Random(7)
+        for _ in range(60):
+            num_atoms = rng.randint(1, 4)
+            secret = rng.sample(CELLS, num_atoms)
+            solver = BlackBoxSolver(num_atoms, SIZE)
+            observations = []
+            for _ in range(rng.randint(0, 6)):
+                if rng.random() < 0.8:
+                    entry = rng.choice(ENTRIES)
+                    result = BlackBoxGame(secret, size=SIZE).shoot_ray(*entry)
+                    solver.observe_ray(entry[0], entry[1], result)
+                    observations.append(('ray', entry, result))
+                else:
+                    cell = rng.choice(CELLS)
+                    solver.observe_guess(cell[0], cell[1], cell in secret)
+                    observations.append(('guess', cell, cell in secret))
+
+            layouts = matching_layouts(num_atoms, observations)
+            self.assertEqual(solver.count_layouts(), len(layouts))
+            self.assertEqual(set(solver.must_contain()), set.intersection(*layouts))
+            self.assertEqual(set(solver.cannot_contain()), set(CELLS) - set.union(*layouts))
+            probabilities = solver.atom_probabilities()
+            for cell in CELLS:
+                expected = sum(cell in layout for layout in layouts) / len(layouts)
+                self.assertAlmostEqual(probabilities[cell], expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
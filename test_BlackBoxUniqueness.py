@@ -0,0 +1,45 @@
+# Description: Checks that BlackBoxUniqueness.layout_signature agrees with BlackBoxGame.shoot_ray, and that the
+# incremental enumeration in analyze groups the layouts of a small number of atoms the same way as working out every
+# signature from scratch.
+
+import collections
+import itertools
+import json
+import os
+import random
+import tempfile
+import unittest
+
+from BlackBoxGame import BlackBoxGame
+import BlackBoxUniqueness as uniqueness
+
+
+class TestLayoutSignature(unittest.TestCase):
+
+    def test_matches_shoot_ray(self):
+        rng = random.Random(1)
+        for _ in range(300):
+            atoms = rng.sample(uniqueness.CELLS, rng.randint(1, 12))
+            signature = uniqueness.layout_signature(atoms)
+            for place, entry in enumerate(uniqueness.ENTRIES):
+                result = BlackBoxGame(atoms).shoot_ray(*entry)
+                expected = 0 if result is None else uniqueness.ENTRIES.index(result) + 1
+                self.assertEqual(signature[place], expected, (atoms, entry))
+
+    def test_analyze_matches_full_signatures(self):
+        num_atoms = 3  # the smallest number of atoms with layouts that cannot be told apart.
+        groups = collections.Counter(
+            uniqueness.layout_signature([uniqueness.CELLS[cell] for cell in layout])
+            for layout in itertools.combinations(range(len(uniqueness.CELLS)), num_atoms))
+        with tempfile.TemporaryDirectory() as output_dir:
+            summary = uniqueness.analyze(num_atoms, output_dir, workers=1)
+            with open(os.path.join(output_dir, 'summary.json')) as summary_file:
+                self.assertEqual(json.load(summary_file), summary)
+        self.assertEqual(summary['layouts'], sum(groups.values()))
+        self.assertEqual(summary['signatures'], len(groups))
+        self.assertEqual(summary['unique'], sum(1 for count in groups.values() if count == 1))
+        self.assertEqual(summary['largest_group'], max(groups.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()